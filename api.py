@@ -1,67 +1,122 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 import os, json, threading, time, schedule
+import gzip, hashlib
+import snapshots
+import history
+import leader
+import metrics
+from location_search import get_search
+from locations import LOCATION_INDEX, LOCATION_ALIASES
 from datetime import datetime, timedelta
-import subprocess
 import traceback
 
 app = Flask(__name__)
 CORS(app)
 
-PREDICTION_PATH = "predictions"
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PREDICTION_PATH = os.environ.get("PREDICTIONS_DIR", os.path.join(BASE_DIR, "predictions"))
+SUMMARY_PATH = os.environ.get("UPDATE_SUMMARY_FILE", os.path.join(BASE_DIR, "update_summary.json"))
+
+# ========== METRICS ==========
+HTTP_REQUESTS = metrics.counter("tulip_http_requests_total", "HTTP requests", ("route", "method", "status"))
+HTTP_REQUEST_SECONDS = metrics.histogram("tulip_http_request_seconds", "HTTP request latency", ("route", "method"))
+RESPONSE_CACHE = metrics.counter(
+    "tulip_response_cache_total", "Serialized response cache lookups (hit, miss, not_modified)", ("result",)
+)
+PREDICTION_RELOADS = metrics.counter("tulip_prediction_cache_reloads_total", "Prediction cache reloads")
+LAST_UPDATE_PHASE = metrics.gauge("tulip_last_update_phase_seconds", "Phase durations of the last update", ("phase",))
+LAST_UPDATE_NASA = metrics.gauge("tulip_last_update_nasa", "NASA request stats of the last update", ("stat",))
+LAST_UPDATE_LOCATIONS = metrics.gauge("tulip_last_update_locations", "Locations per outcome in the last update", ("result",))
+LAST_UPDATE_ELAPSED = metrics.gauge("tulip_last_update_elapsed_seconds", "Total duration of the last update")
+
+@app.before_request
+def start_timer():
+    request.environ["tulip.started"] = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    started = request.environ.get("tulip.started")
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    HTTP_REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+    if started is not None:
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route=route, method=request.method)
+    return response
+
+def load_summary_metrics():
+    """Expose the last update summary (written by the leader) as gauges"""
+    try:
+        with open(SUMMARY_PATH, "r") as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        return
+    
+    for gauge in (LAST_UPDATE_PHASE, LAST_UPDATE_NASA, LAST_UPDATE_LOCATIONS):
+        gauge.clear()
+    for phase, seconds in (summary.get("phases") or {}).items():
+        LAST_UPDATE_PHASE.set(seconds, phase=phase)
+    for stat, value in (summary.get("nasa") or {}).items():
+        if value is not None:
+            LAST_UPDATE_NASA.set(value, stat=stat)
+    for result in ("success", "skipped", "failed"):
+        LAST_UPDATE_LOCATIONS.set(summary.get(result, 0), result=result)
+    LAST_UPDATE_ELAPSED.set(summary.get("elapsed_seconds", 0))
 
 # ========== AUTO-UPDATE MECHANISM ==========
 UPDATE_INTERVAL_HOURS = 6
+AUTO_UPDATE_ENABLED = os.environ.get("AUTO_UPDATE_ENABLED", "1") != "0"
 LAST_UPDATE = None
+LAST_RUN_STARTED_AT = 0.0
 UPDATE_IN_PROGRESS = False
 UPDATE_LOCK = threading.Lock()
 
-def update_predictions_background():
-    global UPDATE_IN_PROGRESS, LAST_UPDATE
+UPDATE_TIMEOUT_SECONDS = int(os.environ.get("UPDATE_TIMEOUT_SECONDS", 300))
+UPDATER = None
+
+def get_updater():
+    """Import the updater engine once; its model and scaler stay loaded"""
+    global UPDATER
+    if UPDATER is None:
+        import update_predictions
+        update_predictions.load_model()
+        UPDATER = update_predictions
+    return UPDATER
+
+def update_predictions_background(mode=None):
+    global UPDATE_IN_PROGRESS, LAST_UPDATE, LAST_RUN_STARTED_AT
     
     if not UPDATE_LOCK.acquire(blocking=False):
         print("⚠️ Update already running, skipping...")
         return
     
     UPDATE_IN_PROGRESS = True
+    started_at = time.time()
     try:
         print(f"🔄 [{datetime.now()}] Starting update...")
         
-        script_path = os.path.join(os.path.dirname(__file__), "update_predictions.py")
+        updater = get_updater()
+        summary = updater.main(deadline=time.time() + UPDATE_TIMEOUT_SECONDS, mode=mode)
         
-        if not os.path.exists(script_path):
-            print(f"❌ Script not found: {script_path}")
-            return
+        if summary.get("timed_out"):
+            print(f"⏰ [{datetime.now()}] Update hit the {UPDATE_TIMEOUT_SECONDS}s deadline")
         
-        result = subprocess.run(
-            ["python", script_path],
-            capture_output=True,
-            text=True,
-            timeout=300,
-            cwd=os.path.dirname(__file__)
-        )
-        
-        if result.returncode == 0:
+        if summary.get("success", 0) > 0:
             print(f"✅ [{datetime.now()}] Update successful!")
-            print("Output:", result.stdout[:200])
             LAST_UPDATE = datetime.now().isoformat() + "Z"
-            
-            try:
-                output_data = json.loads(result.stdout)
-                success = output_data.get('success', 0)
-                failed = output_data.get('failed', 0)
-                print(f"📊 Summary: {success} success, {failed} failed")
-            except:
-                pass
+            PREDICTIONS.invalidate()
+        elif summary.get("status") == "unchanged":
+            print(f"💤 [{datetime.now()}] No newer NASA data, predictions unchanged")
+            LAST_UPDATE = datetime.now().isoformat() + "Z"
         else:
             print(f"❌ [{datetime.now()}] Update failed!")
-            print("Error:", result.stderr[:200])
+        
+        print(f"📊 Summary: {summary.get('success', 0)} success, {summary.get('failed', 0)} failed, {summary.get('carried_over', 0)} carried over")
             
-    except subprocess.TimeoutExpired:
-        print(f"⏰ [{datetime.now()}] Update timeout!")
     except Exception as e:
         print(f"🔥 [{datetime.now()}] Update error: {e}")
+        traceback.print_exc()
     finally:
+        LAST_RUN_STARTED_AT = started_at
         UPDATE_IN_PROGRESS = False
         UPDATE_LOCK.release()
 
@@ -77,45 +132,280 @@ def scheduler_worker():
     while True:
         try:
             schedule.run_pending()
-            time.sleep(60)
+            # Permintaan /force-update dari worker lain
+            forced = leader.take_force_update_request()
+            if forced is not None:
+                # Follower bisa mengantre dari state yang sudah basi; run yang
+                # dimulai setelah permintaan dibuat sudah memenuhinya
+                if forced.get("requested_at", 0) < LAST_RUN_STARTED_AT:
+                    print("💤 Forced update request predates the last run, dropping it")
+                else:
+                    update_predictions_background(forced.get("mode"))
+            time.sleep(SCHEDULER_TICK_SECONDS)
         except Exception as e:
             print(f"⚠️ Scheduler error: {e}")
             time.sleep(60)
 
-# ========== API ENDPOINTS ==========
-def load_prediction(slug):
-    path = os.path.join(PREDICTION_PATH, f"{slug}.json")
-    if not os.path.exists(path):
-        return None
+# ========== LEADER ELECTION (multi-worker) ==========
+# Setiap worker gunicorn menjalankan leader_worker, tetapi hanya pemegang
+# file lock yang menjalankan scheduler. Worker lain membaca status update
+# dari file state yang ditulis leader (heartbeat).
+SCHEDULER_TICK_SECONDS = 5
+IS_LEADER = False
+LEADER_LOCK = leader.LeaderLock()
+SHARED_STATE = {"state": {}, "read_at": 0.0}
+
+def publish_state():
+    leader.write_state(
+        last_update=LAST_UPDATE,
+        update_in_progress=UPDATE_IN_PROGRESS,
+        progress=UPDATER.get_progress() if UPDATER else {"state": "idle"}
+    )
+
+def heartbeat_worker():
+    while True:
+        try:
+            publish_state()
+        except Exception as e:
+            print(f"⚠️ Heartbeat error: {e}")
+        time.sleep(leader.HEARTBEAT_SECONDS)
+
+def leader_worker():
+    global IS_LEADER
+    
+    while not LEADER_LOCK.try_acquire():
+        time.sleep(leader.RETRY_SECONDS)
+    
+    IS_LEADER = True
+    print(f"👑 Worker {os.getpid()} is the scheduler leader")
+    threading.Thread(target=heartbeat_worker, daemon=True).start()
+    scheduler_worker()
+
+def update_state():
+    """(last_update, update_in_progress, progress) as seen by this worker"""
+    if IS_LEADER or not AUTO_UPDATE_ENABLED:
+        progress = UPDATER.get_progress() if UPDATER else {"state": "idle"}
+        return LAST_UPDATE, UPDATE_IN_PROGRESS, progress
+    
+    now = time.monotonic()
+    if now - SHARED_STATE["read_at"] >= CACHE_CHECK_SECONDS:
+        SHARED_STATE["state"] = leader.read_state()
+        SHARED_STATE["read_at"] = now
+    state = SHARED_STATE["state"]
+    progress = state.get("progress") or {"state": "idle"}
+    if state.get("stale"):
+        # Leader berhenti mengirim heartbeat (mati di tengah update): jangan
+        # laporkan update yang tidak lagi berjalan, dan jangan blokir /force-update
+        return state.get("last_update"), False, dict(progress, leader_stale=True)
+    return (
+        state.get("last_update"),
+        bool(state.get("update_in_progress")),
+        progress
+    )
+
+# ========== PREDICTION CACHE ==========
+# Prediksi hasil parse disimpan di memori. Cache hanya memuat ulang saat
+# updater menerbitkan generasi baru (pointer snapshots/CURRENT berganti),
+# dan pointer itu paling sering dicek sekali per CACHE_CHECK_SECONDS.
+# Tanpa snapshot (mis. setelah deploy dari git) file predictions/*.json dipakai.
+CACHE_CHECK_SECONDS = float(os.environ.get("CACHE_CHECK_SECONDS", 5))
+
+class PredictionCache:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.predictions = {}
+        self.slugs = []
+        self.generation_id = None
+        self.marker = None
+        self.checked_at = 0.0
+        self.changed = threading.Condition()
+
+    def current_marker(self):
+        """Snapshot pointer mtime plus predictions directory mtime"""
+        marker = []
+        for p in (snapshots.CURRENT_FILE, self.path):
+            try:
+                marker.append(os.stat(p).st_mtime_ns)
+            except OSError:
+                marker.append(None)
+        return tuple(marker)
+
+    def load_files(self):
+        predictions = {}
+        try:
+            names = sorted(os.listdir(self.path))
+        except FileNotFoundError:
+            names = []
+        
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            slug = name.replace(".json", "")
+            try:
+                with open(os.path.join(self.path, name), "r") as f:
+                    predictions[slug] = json.load(f)
+            except Exception as e:
+                print(f"Error loading {slug}: {e}")
+        return predictions
+
+    def reload(self, marker):
+        generation, predictions = None, {}
+        try:
+            generation, predictions = snapshots.load()
+        except Exception as e:
+            print(f"⚠️ Error loading snapshot: {e}")
+        
+        if not generation:
+            predictions = self.load_files()
+        
+        self.predictions = dict(sorted(predictions.items()))
+        self.slugs = list(self.predictions.keys())
+        self.generation_id = generation
+        self.marker = marker
+        PREDICTION_RELOADS.inc()
+        print(f"🗂️ Prediction cache loaded: {len(predictions)} locations (generation {generation or 'files'})")
+        with self.changed:
+            self.changed.notify_all()
+
+    def refresh(self):
+        now = time.monotonic()
+        if self.marker is not None and now - self.checked_at < CACHE_CHECK_SECONDS:
+            return
+        with self.lock:
+            if self.marker is not None and now - self.checked_at < CACHE_CHECK_SECONDS:
+                return
+            marker = self.current_marker()
+            if marker != self.marker:
+                self.reload(marker)
+            self.checked_at = now
+
+    def invalidate(self):
+        with self.lock:
+            self.checked_at = 0.0
+            self.marker = ("invalidated",)
+
+    def get(self, slug):
+        self.refresh()
+        return self.predictions.get(slug)
+
+    def list(self):
+        self.refresh()
+        return self.slugs
+
+    def cursor(self):
+        """Event cursor: snapshot generation, or the directory mtime in files mode"""
+        if self.generation_id:
+            return self.generation_id
+        return f"files-{self.marker[1] if self.marker else None}"
+
+    def snapshot(self):
+        """Consistent (generation marker, predictions) pair for cached responses"""
+        self.refresh()
+        with self.lock:
+            return self.marker, self.predictions
+
+    def state(self):
+        """Consistent (cursor, predictions) pair"""
+        self.refresh()
+        with self.lock:
+            return self.cursor(), self.predictions
+
+    def wait_for_change(self, cursor, timeout):
+        """Block until the cursor differs from `cursor` or timeout passes; returns the cursor"""
+        deadline = time.monotonic() + timeout
+        while True:
+            current = self.state()[0]
+            remaining = deadline - time.monotonic()
+            if current != cursor or remaining <= 0:
+                return current
+            with self.changed:
+                self.changed.wait(min(remaining, CACHE_CHECK_SECONDS))
+
+PREDICTIONS = PredictionCache(PREDICTION_PATH)
+
+# ========== SERIALIZED RESPONSES ==========
+# Body JSON (dan versi gzip) dibuat sekali per generasi prediksi, lalu
+# dilayani dengan ETag kuat, 304 untuk If-None-Match, dan Cache-Control.
+RESPONSES = {}
+RESPONSES_LOCK = threading.Lock()
+
+def cache_max_age():
+    """Seconds until the next scheduled update (60 s .. UPDATE_INTERVAL_HOURS)"""
+    interval = UPDATE_INTERVAL_HOURS * 3600
+    last_update = update_state()[0]
+    if not last_update:
+        return 60
     try:
-        with open(path, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error loading {slug}: {e}")
-        return None
+        last_update_dt = datetime.fromisoformat(last_update.replace('Z', ''))
+        remaining = (last_update_dt + timedelta(seconds=interval) - datetime.now()).total_seconds()
+        return int(min(interval, max(60, remaining)))
+    except ValueError:
+        return 60
 
+def serialize_response(payload):
+    body = app.json.dumps(payload).encode("utf-8")
+    etag = hashlib.sha1(body).hexdigest()
+    return {
+        "body": body,
+        "gzip": gzip.compress(body, compresslevel=6, mtime=0),
+        "etag": etag,
+        "etag_gzip": etag + "-gz"
+    }
+
+def cached_response(key, build):
+    """Serve a pre-serialized JSON response, rebuilding it once per generation
+    
+    build(predictions) receives the predictions of the same generation the
+    entry is keyed on, so a reload between lookup and caching cannot store
+    an old body under a new generation's ETag.
+    """
+    generation, predictions = PREDICTIONS.snapshot()
+    entry = RESPONSES.get(key)
+    
+    built = entry is None or entry["generation"] != generation
+    if built:
+        entry = serialize_response(build(predictions))
+        entry["generation"] = generation
+        with RESPONSES_LOCK:
+            # Buang entri dari generasi lama
+            for old_key in [k for k, v in RESPONSES.items() if v["generation"] != generation]:
+                del RESPONSES[old_key]
+            RESPONSES[key] = entry
+    
+    use_gzip = request.accept_encodings["gzip"] > 0
+    etag = entry["etag_gzip"] if use_gzip else entry["etag"]
+    
+    if request.if_none_match.contains(etag):
+        RESPONSE_CACHE.inc(result="not_modified")
+        response = Response(status=304)
+    else:
+        RESPONSE_CACHE.inc(result="miss" if built else "hit")
+        response = Response(entry["gzip"] if use_gzip else entry["body"], mimetype="application/json")
+        if use_gzip:
+            response.headers["Content-Encoding"] = "gzip"
+    
+    response.set_etag(etag)
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = f"public, max-age={cache_max_age()}, must-revalidate"
+    return response
+
+# ========== API ENDPOINTS ==========
 def list_predictions():
-    try:
-        return [
-            f.replace(".json", "")
-            for f in os.listdir(PREDICTION_PATH)
-            if f.endswith(".json")
-        ]
-    except FileNotFoundError:
-        return []
+    return list(PREDICTIONS.list())
 
 @app.route("/")
 def health():
-    from locations import LOCATION_INDEX
-    
+    last_update, in_progress, _ = update_state()
     status_info = {
         "status": "ok",
-        "mode": "auto-update-enabled",
+        "mode": "auto-update-enabled" if AUTO_UPDATE_ENABLED else "auto-update-disabled",
         "service": "TULIP Smart Climate API",
         "version": "2.3-laravel",
         "update_interval_hours": UPDATE_INTERVAL_HOURS,
-        "last_update": LAST_UPDATE,
-        "update_in_progress": UPDATE_IN_PROGRESS,
+        "last_update": last_update,
+        "update_in_progress": in_progress,
+        "scheduler_leader": IS_LEADER,
         "total_locations": len(LOCATION_INDEX),
         "locations_available": len(list_predictions()),
         "server_time": datetime.now().isoformat(),
@@ -124,8 +414,15 @@ def health():
             "/": "Health check",
             "/locations": "List all locations",
             "/predict/<slug>": "Get prediction for location",
+            "/predict-bulk": "Get predictions for many locations (slugs, group, parent)",
+            "/history/<slug>": "Prediction history (?from=, ?to=, ?page=, ?per_page=)",
+            "/nearest": "Nearest locations (?lat=, ?lon=, ?k=)",
+            "/within": "Locations in bounding box (?bbox=min_lon,min_lat,max_lon,max_lat)",
+            "/risk-map/<name>": "Gridded risk map slice (?bbox=, ?format=json|npz)",
             "/force-update": "Force update predictions",
             "/update-status": "Check update status",
+            "/events": "Prediction changes since ?cursor= (long-poll, or SSE with ?stream=1)",
+            "/metrics": "Prometheus metrics (per worker)",
             "/debug-update": "Debug update script",
             "/laravel-locations": "Get locations compatible with Laravel"
         }
@@ -134,31 +431,50 @@ def health():
 
 @app.route("/locations")
 def locations():
-    locations_list = list_predictions()
-    return jsonify({
-        "jumlah": len(locations_list),
-        "locations": locations_list,
-        "last_update": LAST_UPDATE,
-        "server_time": datetime.now().isoformat()
-    })
+    def build(predictions):
+        locations_list = list(predictions)
+        return {
+            "jumlah": len(locations_list),
+            "locations": locations_list,
+            "last_update": update_state()[0],
+            "server_time": datetime.now().isoformat()
+        }
+    return cached_response("locations", build)
 
 @app.route("/laravel-locations")
 def laravel_locations():
     """Endpoint khusus untuk Laravel - return locations dalam format Laravel"""
-    from locations import LOCATION_INDEX
+    def build(predictions):
+        laravel_format = []
+        for slug, loc in LOCATION_INDEX.items():
+            laravel_format.append({
+                "value": slug,
+                "text": f"{loc['name']} ({loc['parent']})"
+            })
+        
+        return {
+            "locations": laravel_format,
+            "count": len(laravel_format),
+            "compatible": True
+        }
+    return cached_response("laravel-locations", build)
+
+def with_metadata(data):
+    """Add API metadata to a (copied) prediction dict"""
+    # Add metadata
+    data["api_version"] = "2.3-laravel"
+    data["retrieved_at"] = datetime.now().isoformat()
     
-    laravel_format = []
-    for slug, loc in LOCATION_INDEX.items():
-        laravel_format.append({
-            "value": slug,
-            "text": f"{loc['name']} ({loc['parent']})"
-        })
+    # Calculate data age
+    if "date" in data and data["date"] and "data_age_days" not in data:
+        try:
+            data_date = datetime.strptime(data["date"], "%Y%m%d")
+            data_age = datetime.utcnow() - data_date
+            data["data_age_days"] = data_age.days
+        except:
+            pass
     
-    return jsonify({
-        "locations": laravel_format,
-        "count": len(laravel_format),
-        "compatible": True
-    })
+    return data
 
 @app.route("/predict/<slug>")
 def predict_slug(slug):
@@ -167,10 +483,18 @@ def predict_slug(slug):
     if not slug or slug == "undefined":
         return jsonify({"error": "Invalid location slug"}), 400
     
-    data = load_prediction(slug)
+    data = PREDICTIONS.get(slug)
     if not data:
-        all_locations = list_predictions()
-        possible_matches = [loc for loc in all_locations if slug in loc]
+        search = get_search(LOCATION_INDEX, LOCATION_ALIASES)
+        
+        # Alias / slug lama -> slug kanonik
+        resolved = search.resolve(slug)
+        if resolved and resolved != slug:
+            data = PREDICTIONS.get(resolved)
+            if data:
+                return cached_response(("predict", resolved), lambda predictions: with_metadata(dict(predictions[resolved])))
+        
+        possible_matches = [s for s in search.suggest(slug) if PREDICTIONS.get(s)]
         
         if possible_matches:
             return jsonify({
@@ -182,51 +506,381 @@ def predict_slug(slug):
         return jsonify({
             "error": "Prediction not available",
             "slug": slug,
-            "available_locations": all_locations[:10]
+            "available_locations": list_predictions()[:10]
         }), 404
     
-    # Add metadata
-    data["api_version"] = "2.3-laravel"
-    data["retrieved_at"] = datetime.now().isoformat()
+    return cached_response(("predict", slug), lambda predictions: with_metadata(dict(predictions[slug])))
+
+@app.route("/predict-bulk", methods=["GET", "POST"])
+def predict_bulk():
+    """Many predictions in one response, by slug list and/or group/parent filter"""
+    params = {}
+    if request.method == "POST":
+        params = request.get_json(silent=True) or {}
+        if not isinstance(params, dict):
+            return jsonify({"error": "JSON body must be an object"}), 400
     
-    # Calculate data age
-    if "date" in data and data["date"] and "data_age_days" not in data:
+    slugs = params.get("slugs") or request.args.get("slugs")
+    if isinstance(slugs, str):
+        slugs = [s.strip() for s in slugs.split(",") if s.strip()]
+    group = params.get("group") or request.args.get("group")
+    parent = params.get("parent") or request.args.get("parent")
+    
+    if not slugs and not group and not parent:
+        return jsonify({"error": "Provide slugs, group or parent"}), 400
+    
+    if slugs is not None and not (isinstance(slugs, list) and all(isinstance(s, str) for s in slugs)):
+        return jsonify({"error": "slugs must be a list of strings or comma-separated string"}), 400
+    
+    candidates = slugs if slugs else list_predictions()
+    
+    predictions = {}
+    missing = []
+    for slug in candidates:
+        data = PREDICTIONS.get(slug)
+        if data is None:
+            missing.append(slug)
+            continue
+        if group and data.get("group") != group:
+            continue
+        if parent and data.get("parent") != parent:
+            continue
+        predictions[slug] = with_metadata(dict(data))
+    
+    return jsonify({
+        "count": len(predictions),
+        "predictions": predictions,
+        "missing": missing,
+        "filters": {"group": group, "parent": parent},
+        "last_update": update_state()[0],
+        "server_time": datetime.now().isoformat()
+    })
+
+NEAREST_MAX_K = 50
+
+def spatial_result(slug, loc, distance_km=None):
+    """Location entry for /nearest and /within, with its current risk if known"""
+    entry = {
+        "slug": slug,
+        "name": loc["name"],
+        "group": loc["group"],
+        "parent": loc["parent"],
+        "lat": loc["lat"],
+        "lon": loc["lon"]
+    }
+    if distance_km is not None:
+        entry["distance_km"] = round(distance_km, 3)
+    prediction = PREDICTIONS.get(slug)
+    if prediction:
+        entry["date"] = prediction.get("date")
+        entry["percentage"] = (prediction.get("prediction") or {}).get("percentage")
+        entry["level"] = (prediction.get("interpretasi") or {}).get("level")
+    return entry
+
+@app.route("/nearest")
+def nearest():
+    """k nearest catalog locations to ?lat=&lon="""
+    from spatial_index import get_spatial_index
+    
+    try:
+        lat = float(request.args["lat"])
+        lon = float(request.args["lon"])
+        k = int(request.args.get("k", 5))
+    except (KeyError, ValueError):
+        return jsonify({"error": "lat and lon are required numbers, k an integer"}), 400
+    
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or k < 1:
+        return jsonify({"error": "lat/lon out of range or k < 1"}), 400
+    
+    matches = get_spatial_index(LOCATION_INDEX).nearest(lat, lon, min(k, NEAREST_MAX_K))
+    return jsonify({
+        "query": {"lat": lat, "lon": lon, "k": min(k, NEAREST_MAX_K)},
+        "count": len(matches),
+        "results": [spatial_result(slug, LOCATION_INDEX[slug], d) for slug, d in matches]
+    })
+
+@app.route("/within")
+def within():
+    """Catalog locations inside ?bbox=min_lon,min_lat,max_lon,max_lat"""
+    from spatial_index import get_spatial_index
+    
+    try:
+        min_lon, min_lat, max_lon, max_lat = [float(v) for v in request.args["bbox"].split(",")]
+    except (KeyError, ValueError):
+        return jsonify({"error": "bbox must be min_lon,min_lat,max_lon,max_lat"}), 400
+    
+    if min_lat > max_lat:
+        return jsonify({"error": "min_lat must not exceed max_lat"}), 400
+    
+    slugs = get_spatial_index(LOCATION_INDEX).within(min_lon, min_lat, max_lon, max_lat)
+    return jsonify({
+        "bbox": [min_lon, min_lat, max_lon, max_lat],
+        "count": len(slugs),
+        "results": [spatial_result(slug, LOCATION_INDEX[slug]) for slug in slugs]
+    })
+
+RISK_MAPS = {}
+
+@app.route("/risk-map/<name>")
+def risk_map(name):
+    """Slice of a gridded risk map (?bbox=min_lon,min_lat,max_lon,max_lat, ?format=json|npz)"""
+    import io
+    import numpy as np
+    import risk_artifacts
+    
+    path = os.path.join(risk_artifacts.RISK_MAP_DIR, f"{os.path.basename(name)}.npz")
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return jsonify({"error": "Risk map not available", "name": name}), 404
+    
+    cached = RISK_MAPS.get(name)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, risk_artifacts.load_risk_grid(name))
+        RISK_MAPS[name] = cached
+    grid = cached[1]
+    
+    try:
+        bbox = risk_artifacts.parse_bbox(request.args["bbox"]) if request.args.get("bbox") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    lat, lon, probability = risk_artifacts.slice_risk_grid(grid, bbox)
+    
+    if request.args.get("format") == "npz":
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, lat=lat, lon=lon, probability=probability, date=grid["date"])
+        return Response(buffer.getvalue(), mimetype="application/octet-stream")
+    
+    values = probability.astype(float)
+    return jsonify({
+        "name": name,
+        "date": str(grid["date"]),
+        "created_at": str(grid["created_at"]),
+        "resolution": float(grid["resolution"]),
+        "bbox": bbox or [float(v) for v in grid["bbox"]],
+        "lat": [round(float(v), 4) for v in lat],
+        "lon": [round(float(v), 4) for v in lon],
+        "probability": np.where(np.isfinite(values), np.round(values, 4), None).tolist()
+    })
+
+HISTORY_MAX_PER_PAGE = 500
+
+def parse_history_date(value):
+    """Accept YYYYMMDD or YYYY-MM-DD; returns YYYYMMDD or raises ValueError"""
+    if not value:
+        return None
+    value = value.replace("-", "")
+    datetime.strptime(value, "%Y%m%d")
+    return value
+
+@app.route("/history/<slug>")
+def prediction_history(slug):
+    """Stored predictions for one location, newest first, paginated"""
+    try:
+        date_from = parse_history_date(request.args.get("from"))
+        date_to = parse_history_date(request.args.get("to"))
+    except ValueError:
+        return jsonify({"error": "from/to must be YYYYMMDD or YYYY-MM-DD"}), 400
+    
+    try:
+        page = max(1, int(request.args.get("page", 1)))
+        per_page = min(HISTORY_MAX_PER_PAGE, max(1, int(request.args.get("per_page", 50))))
+    except ValueError:
+        return jsonify({"error": "page and per_page must be integers"}), 400
+    
+    items, total = history.query(slug, date_from, date_to, per_page, (page - 1) * per_page)
+    
+    return jsonify({
+        "slug": slug,
+        "from": date_from,
+        "to": date_to,
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "pages": (total + per_page - 1) // per_page,
+        "items": items
+    })
+
+# ========== CHANGE EVENTS (long-poll / SSE) ==========
+# Klien menyimpan cursor (generasi snapshot) dan hanya menerima lokasi yang
+# level risikonya berubah sejak cursor itu. Diff dihitung dari file snapshot
+# sehingga hasilnya sama di semua worker.
+EVENTS_MAX_WAIT_SECONDS = float(os.environ.get("EVENTS_MAX_WAIT_SECONDS", 30))
+EVENTS_STREAM_SECONDS = float(os.environ.get("EVENTS_STREAM_SECONDS", 300))
+EVENTS_HEARTBEAT_SECONDS = 15
+# Setiap long-poll/SSE menahan satu thread worker; batasi jumlahnya agar
+# sisa thread tetap melayani /predict (default: setengah GUNICORN_THREADS)
+EVENTS_MAX_WAITERS = int(os.environ.get("EVENTS_MAX_WAITERS", max(1, int(os.environ.get("GUNICORN_THREADS", 8)) // 2)))
+EVENTS_RETRY_AFTER_SECONDS = 5
+EVENTS_WAITERS = threading.BoundedSemaphore(EVENTS_MAX_WAITERS)
+CHANGE_EVENTS = {}
+CHANGE_EVENTS_LOCK = threading.Lock()
+
+def risk_entry(data):
+    prediction = data.get("prediction") or {}
+    interpretasi = data.get("interpretasi") or {}
+    return {
+        "date": data.get("date"),
+        "percentage": prediction.get("percentage"),
+        "level": interpretasi.get("level"),
+        "status": interpretasi.get("status")
+    }
+
+def change_event(cursor):
+    """Risk changes between generation `cursor` and the current one
+    
+    Without a usable cursor (none given, unknown or pruned generation)
+    the event is a reset carrying every location.
+    """
+    current, predictions = PREDICTIONS.state()
+    key = (cursor, current)
+    with CHANGE_EVENTS_LOCK:
+        if key in CHANGE_EVENTS:
+            return CHANGE_EVENTS[key]
+    
+    entries = {slug: risk_entry(data) for slug, data in predictions.items()}
+    previous = None
+    if cursor == current:
+        previous = entries
+    elif cursor in snapshots.list_generations():
         try:
-            data_date = datetime.strptime(data["date"], "%Y%m%d")
-            data_age = datetime.utcnow() - data_date
-            data["data_age_days"] = data_age.days
-        except:
-            pass
+            previous = {slug: risk_entry(data) for slug, data in snapshots.load(cursor)[1].items()}
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Error loading generation {cursor}: {e}")
     
-    return jsonify(data)
+    if previous is None:
+        event = {"cursor": current, "previous": cursor, "reset": True, "changed": entries, "removed": []}
+    else:
+        event = {
+            "cursor": current,
+            "previous": cursor,
+            "reset": False,
+            "changed": {slug: e for slug, e in entries.items() if previous.get(slug) != e},
+            "removed": sorted(slug for slug in previous if slug not in entries)
+        }
+    
+    with CHANGE_EVENTS_LOCK:
+        if len(CHANGE_EVENTS) > 64:
+            CHANGE_EVENTS.clear()
+        CHANGE_EVENTS[key] = event
+    return event
+
+def sse_message(event):
+    return f"id: {event['cursor']}\nevent: generation\ndata: {json.dumps(event)}\n\n"
+
+def stream_events(cursor):
+    """SSE generator: one event per new generation, comments as heartbeat"""
+    deadline = time.monotonic() + EVENTS_STREAM_SECONDS
+    yield "retry: 5000\n\n"
+    
+    if PREDICTIONS.state()[0] != cursor:
+        event = change_event(cursor)
+        cursor = event["cursor"]
+        yield sse_message(event)
+    
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        current = PREDICTIONS.wait_for_change(cursor, min(EVENTS_HEARTBEAT_SECONDS, remaining))
+        if current != cursor:
+            event = change_event(cursor)
+            cursor = event["cursor"]
+            yield sse_message(event)
+        else:
+            yield ": keep-alive\n\n"
+
+def events_busy():
+    """503 for a waiter over EVENTS_MAX_WAITERS"""
+    response = jsonify({
+        "error": "Too many clients waiting for events",
+        "retry_after": EVENTS_RETRY_AFTER_SECONDS
+    })
+    response.status_code = 503
+    response.headers["Retry-After"] = str(EVENTS_RETRY_AFTER_SECONDS)
+    return response
+
+@app.route("/events")
+def events():
+    """Prediction changes since ?cursor= (long-poll JSON, or SSE with ?stream=1)"""
+    cursor = request.args.get("cursor") or request.headers.get("Last-Event-ID")
+    
+    if request.args.get("stream") == "1" or "text/event-stream" in request.headers.get("Accept", ""):
+        if not EVENTS_WAITERS.acquire(blocking=False):
+            return events_busy()
+        response = Response(
+            stream_events(cursor),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+        # Slot dilepas saat stream selesai atau klien memutus koneksi
+        response.call_on_close(EVENTS_WAITERS.release)
+        return response
+    
+    try:
+        timeout = float(request.args.get("timeout", EVENTS_MAX_WAIT_SECONDS))
+    except ValueError:
+        return jsonify({"error": "timeout must be a number"}), 400
+    timeout = min(EVENTS_MAX_WAIT_SECONDS, max(0.0, timeout))
+    
+    if cursor and timeout and PREDICTIONS.state()[0] == cursor:
+        if not EVENTS_WAITERS.acquire(blocking=False):
+            # Tidak ada perubahan untuk dikirim dan tidak ada slot untuk menunggu
+            return events_busy()
+        try:
+            PREDICTIONS.wait_for_change(cursor, timeout)
+        finally:
+            EVENTS_WAITERS.release()
+    
+    response = jsonify(change_event(cursor))
+    response.headers["Cache-Control"] = "no-store"
+    return response
 
 @app.route("/force-update", methods=["POST"])
 def force_update():
-    if UPDATE_IN_PROGRESS:
+    """Start an update; ?mode=full reprocesses every location"""
+    mode = request.args.get("mode")
+    if mode not in (None, "full", "selective"):
+        return jsonify({"error": "mode must be full or selective"}), 400
+    
+    last_update, in_progress, _ = update_state()
+    if in_progress:
         return jsonify({
             "status": "busy",
             "message": "Update already in progress",
-            "last_update": LAST_UPDATE,
+            "last_update": last_update,
             "timestamp": datetime.now().isoformat()
         }), 409
     
-    thread = threading.Thread(target=update_predictions_background, daemon=True)
+    if AUTO_UPDATE_ENABLED and not IS_LEADER:
+        # Hanya leader yang menjalankan update; titipkan permintaan
+        leader.request_force_update(mode)
+        return jsonify({
+            "status": "queued",
+            "message": "Update requested from the scheduler leader",
+            "timestamp": datetime.now().isoformat()
+        }), 202
+    
+    thread = threading.Thread(target=update_predictions_background, args=(mode,), daemon=True)
     thread.start()
     
     return jsonify({
         "status": "started",
+        "mode": mode or "default",
         "message": "Update started in background",
         "timestamp": datetime.now().isoformat()
     })
 
 @app.route("/update-status")
 def update_status():
+    last_update, in_progress, progress = update_state()
     next_update = None
     next_update_in = None
     
-    if LAST_UPDATE:
+    if last_update:
         try:
-            last_update_dt = datetime.fromisoformat(LAST_UPDATE.replace('Z', '+00:00'))
+            last_update_dt = datetime.fromisoformat(last_update.replace('Z', '+00:00'))
             next_update_dt = last_update_dt + timedelta(hours=UPDATE_INTERVAL_HOURS)
             next_update = next_update_dt.isoformat()
             
@@ -237,15 +891,23 @@ def update_status():
             pass
     
     return jsonify({
-        "last_update": LAST_UPDATE,
-        "update_in_progress": UPDATE_IN_PROGRESS,
+        "last_update": last_update,
+        "update_in_progress": in_progress,
         "update_interval_hours": UPDATE_INTERVAL_HOURS,
         "next_update": next_update,
         "next_update_in_hours": next_update_in,
         "total_predictions": len(list_predictions()),
+        "generation": PREDICTIONS.generation_id,
+        "progress": progress,
+        "scheduler_leader": IS_LEADER,
         "timestamp": datetime.now().isoformat()
     })
 
+@app.route("/metrics")
+def metrics_endpoint():
+    load_summary_metrics()
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/debug-update")
 def debug_update():
     try:
@@ -272,7 +934,6 @@ def initialize_background_tasks():
     print(f"📅 Auto-update every {UPDATE_INTERVAL_HOURS} hours")
     print(f"📁 Predictions path: {os.path.abspath(PREDICTION_PATH)}")
     
-    from locations import LOCATION_INDEX
     print(f"📊 Total locations configured: {len(LOCATION_INDEX)}")
     
     print("\n📡 Available endpoints:")
@@ -280,14 +941,29 @@ def initialize_background_tasks():
     print("  - GET  /locations          # List locations")
     print("  - GET  /laravel-locations  # Laravel format locations")
     print("  - GET  /predict/<slug>     # Get prediction")
+    print("  - GET  /predict-bulk       # Many predictions (?slugs=, ?group=, ?parent=)")
+    print("  - GET  /history/<slug>     # Prediction history (?from=, ?to=, ?page=)")
+    print("  - GET  /nearest            # Nearest locations (?lat=, ?lon=, ?k=)")
+    print("  - GET  /within             # Locations in bbox (?bbox=)")
+    print("  - GET  /risk-map/<name>    # Gridded risk map slice (?bbox=, ?format=)")
     print("  - POST /force-update       # Manual update")
     print("  - GET  /update-status      # Check update status")
+    print("  - GET  /events             # Changes since ?cursor= (long-poll / SSE)")
+    print("  - GET  /metrics            # Prometheus metrics")
     print("=" * 60)
     
-    scheduler_thread = threading.Thread(target=scheduler_worker, daemon=True)
+    # Multi-worker: counter/histogram worker ini ikut digabung di /metrics
+    metrics.start_flusher()
+    
+    if not AUTO_UPDATE_ENABLED:
+        print("⏸️ Auto-update disabled (AUTO_UPDATE_ENABLED=0)")
+        return
+    
+    # Semua worker ikut pemilihan; hanya leader yang menjalankan scheduler
+    scheduler_thread = threading.Thread(target=leader_worker, daemon=True)
     scheduler_thread.start()
     
-    print("✅ Background scheduler started")
+    print("✅ Background scheduler election started")
 
 with app.app_context():
     initialize_background_tasks()
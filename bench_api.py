@@ -0,0 +1,228 @@
+# bench_api.py - Benchmark beban untuk API Flask (throughput + p50/p95/p99)
+# Server api:app dijalankan lokal di subprocess dengan AUTO_UPDATE_ENABLED=0
+# dan snapshot prediksi tetap (dibangun dari file predictions/*.json di repo),
+# lalu setiap endpoint dibebani dengan N klien paralel (koneksi keep-alive).
+# Laporan JSON menyertakan commit git sehingga hasil antar commit bisa
+# dibandingkan (--baseline).
+#
+#   python bench_api.py
+#   python bench_api.py --concurrency 16 --requests 2000 --output bench_output.txt
+#   python bench_api.py --baseline bench_output.txt --max-regression 20
+
+import os, sys, json, time, shutil, socket, argparse, tempfile, threading, subprocess
+import http.client
+from urllib.parse import quote
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(BASE_DIR, "predictions")
+
+ENDPOINTS = ["/", "/locations", "/laravel-locations", "/predict/<slug>"]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=BASE_DIR)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+def build_snapshot(snapshot_dir):
+    """Publish the committed predictions/*.json as one fixed generation"""
+    predictions = {}
+    for name in sorted(os.listdir(FIXTURE_DIR)):
+        if name.endswith(".json"):
+            with open(os.path.join(FIXTURE_DIR, name), "r") as f:
+                predictions[name[:-len(".json")]] = json.load(f)
+
+    os.environ["SNAPSHOT_DIR"] = snapshot_dir
+    import snapshots
+    snapshots.publish(predictions)
+    return sorted(predictions)
+
+def start_server(server, port, snapshot_dir, workers, threads):
+    env = dict(os.environ, AUTO_UPDATE_ENABLED="0", SNAPSHOT_DIR=snapshot_dir, PYTHONWARNINGS="ignore")
+    if server == "gunicorn":
+        cmd = [
+            sys.executable, "-m", "gunicorn", "api:app",
+            "--bind", f"127.0.0.1:{port}",
+            "--workers", str(workers),
+            "--threads", str(threads),
+            "--log-level", "warning"
+        ]
+    else:
+        cmd = [
+            sys.executable, "-c",
+            f"import api; api.app.run(host='127.0.0.1', port={port}, threaded=True)"
+        ]
+    return subprocess.Popen(cmd, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def wait_ready(port, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become ready")
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+def drive(port, paths, total, concurrency, headers):
+    """Send `total` GETs cycling over paths with `concurrency` keep-alive clients"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        local = []
+        local_errors = 0
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            path = paths[i % len(paths)]
+            started = time.perf_counter()
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    local_errors += 1
+                if response.getheader("Connection", "").lower() == "close":
+                    conn.close()
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            local.append(time.perf_counter() - started)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 2) if v is not None else None
+    return {
+        "requests": total,
+        "errors": errors[0],
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99))
+    }
+
+def compare(report, baseline, max_regression):
+    """Print per-endpoint deltas; True when no p95 grew more than max_regression %"""
+    ok = True
+    for endpoint, result in report["endpoints"].items():
+        old = baseline.get("endpoints", {}).get(endpoint)
+        if not old or not old.get("p95_ms") or result["p95_ms"] is None:
+            continue
+        delta = (result["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+        regressed = max_regression is not None and delta > max_regression
+        ok = ok and not regressed
+        status = "❌" if regressed else "✅"
+        print(f"{status} {endpoint:<20} p95 {old['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms ({delta:+.1f}%)")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Flask API against a fixed snapshot")
+    parser.add_argument("--server", choices=["gunicorn", "flask"], default="gunicorn")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel clients")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=50, help="Unmeasured requests per endpoint")
+    parser.add_argument("--endpoint", action="append", choices=ENDPOINTS, help="Limit to these endpoints")
+    parser.add_argument("--gzip", action="store_true", help="Send Accept-Encoding: gzip")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--baseline", help="Previous JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, help="Fail if any p95 grows more than this %%")
+    args = parser.parse_args()
+
+    snapshot_dir = tempfile.mkdtemp(prefix="tulip-bench-")
+    port = free_port()
+    process = None
+    try:
+        slugs = build_snapshot(snapshot_dir)
+        process = start_server(args.server, port, snapshot_dir, args.workers, args.threads)
+        wait_ready(port, process)
+
+        headers = {"Accept-Encoding": "gzip"} if args.gzip else {}
+        report = {
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "server": args.server,
+            "workers": args.workers,
+            "threads": args.threads,
+            "concurrency": args.concurrency,
+            "gzip": args.gzip,
+            "snapshot_locations": len(slugs),
+            "endpoints": {}
+        }
+
+        for endpoint in args.endpoint or ENDPOINTS:
+            if endpoint == "/predict/<slug>":
+                paths = [f"/predict/{quote(slug)}" for slug in slugs]
+            else:
+                paths = [endpoint]
+            if args.warmup:
+                drive(port, paths, args.warmup, args.concurrency, headers)
+            result = drive(port, paths, args.requests, args.concurrency, headers)
+            report["endpoints"][endpoint] = result
+            print(
+                f"📈 {endpoint:<20} {result['throughput_rps']:>8.1f} req/s  "
+                f"p50 {result['p50_ms']:>7.2f}  p95 {result['p95_ms']:>7.2f}  p99 {result['p99_ms']:>7.2f} ms  "
+                f"errors {result['errors']}"
+            )
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    ok = all(r["errors"] == 0 for r in report["endpoints"].values())
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            ok = compare(report, json.load(f), args.max_regression) and ok
+
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# bench_startup.py - Benchmark waktu import (cold start) modul utama
+# Setiap import diukur di proses Python baru, beberapa kali, lalu median
+# dibandingkan dengan anggaran. Exit code 1 bila ada yang melewati anggaran,
+# sehingga bisa dipakai sebagai guard di CI.
+#
+#   python bench_startup.py
+#   python bench_startup.py --runs 9 --budget api=400 --output bench_output.txt
+
+import os, sys, json, argparse, statistics, subprocess
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Anggaran default (ms) untuk median waktu import
+DEFAULT_BUDGETS_MS = {
+    "locations": 50,
+    "update_predictions": 300,
+    "api": 600,
+}
+
+PROBE = (
+    "import time, sys; t = time.perf_counter(); import {module}; "
+    "sys.stdout.write('\\nBENCH %.3f\\n' % ((time.perf_counter() - t) * 1000)); "
+    "sys.stdout.write('HEAVY %s\\n' % ','.join(m for m in ('pandas', 'sklearn', 'joblib') if m in sys.modules))"
+)
+
+def measure(module, runs):
+    """Median import time (ms) of module in fresh interpreters, plus heavy modules loaded"""
+    env = dict(os.environ, AUTO_UPDATE_ENABLED="0")
+    timings = []
+    heavy = ""
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", PROBE.format(module=module)],
+            capture_output=True, text=True, cwd=BASE_DIR, env=env, timeout=120
+        )
+        if out.returncode != 0:
+            raise RuntimeError(f"import {module} failed: {out.stderr[-500:]}")
+        for line in out.stdout.splitlines():
+            if line.startswith("BENCH "):
+                timings.append(float(line.split()[1]))
+            elif line.startswith("HEAVY "):
+                heavy = line[len("HEAVY "):].strip()
+    return {
+        "median_ms": round(statistics.median(timings), 1),
+        "min_ms": round(min(timings), 1),
+        "max_ms": round(max(timings), 1),
+        "heavy_imports": [m for m in heavy.split(",") if m]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import times")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", action="append", default=[], help="module=ms (overrides default)")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    budgets = dict(DEFAULT_BUDGETS_MS)
+    for item in args.budget:
+        module, ms = item.split("=")
+        budgets[module] = float(ms)
+
+    report = {"python": sys.version.split()[0], "runs": args.runs, "modules": {}}
+    ok = True
+    for module, budget in budgets.items():
+        result = measure(module, args.runs)
+        result["budget_ms"] = budget
+        result["ok"] = result["median_ms"] <= budget and not result["heavy_imports"]
+        ok = ok and result["ok"]
+        report["modules"][module] = result
+        status = "✅" if result["ok"] else "❌"
+        heavy = f" (loaded {', '.join(result['heavy_imports'])})" if result["heavy_imports"] else ""
+        print(f"{status} {module:<20} median {result['median_ms']:>7.1f} ms  budget {budget:.0f} ms{heavy}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
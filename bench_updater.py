@@ -0,0 +1,153 @@
+# bench_updater.py - Benchmark end-to-end updater (fetch, parse, score, write)
+# Menjalankan nasa_stub.py lokal (latensi, 429 dan celah -999 bisa diatur),
+# lalu update_predictions.main() di proses baru dengan semua state (cache,
+# series store, snapshot, history, file prediksi) di direktori sementara.
+# Hasil: lokasi/detik plus durasi fase dan statistik NASA dari ringkasan update.
+#
+#   python bench_updater.py
+#   python bench_updater.py --latency-ms 200 --rate-429 0.05 --workers 8 --runs 3
+#   python bench_updater.py --warm --output bench_output.txt
+#   python bench_updater.py --warm --mode selective   # biaya run yang tidak berubah
+
+import os, sys, json, time, shutil, socket, argparse, tempfile, statistics, subprocess
+
+import nasa_stub
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+RUN_UPDATE = "import update_predictions as u; u.main(max_workers={workers}, mode={mode!r})"
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_stub(port, args):
+    cmd = [sys.executable, os.path.join(BASE_DIR, "nasa_stub.py"), "--port", str(port)]
+    for key, value in nasa_stub.options_from(args).items():
+        cmd += [f"--{key.replace('_', '-')}", str(value)]
+    process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("NASA stub exited early")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("NASA stub did not start")
+
+def state_env(state_dir, base_url, args):
+    """Environment that keeps every updater artifact inside state_dir"""
+    return dict(
+        os.environ,
+        PYTHONWARNINGS="ignore",
+        NASA_POWER_BASE_URL=base_url,
+        NASA_TRANSPORT="live",
+        NASA_RATE_PER_SECOND=str(args.rate),
+        NASA_CACHE_PATH=os.path.join(state_dir, "nasa_cache.sqlite"),
+        SERIES_PATH=os.path.join(state_dir, "series.sqlite"),
+        SNAPSHOT_DIR=os.path.join(state_dir, "snapshots"),
+        HISTORY_PATH=os.path.join(state_dir, "history.sqlite"),
+        PREDICTIONS_DIR=os.path.join(state_dir, "predictions"),
+        UPDATE_SUMMARY_FILE=os.path.join(state_dir, "update_summary.json"),
+        UPDATE_LOG_FILE=os.path.join(state_dir, "update.log"),
+    )
+
+def run_once(env, workers, mode):
+    started = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", RUN_UPDATE.format(workers=workers, mode=mode)],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, timeout=1800
+    )
+    wall = time.perf_counter() - started
+    if out.returncode != 0:
+        raise RuntimeError(f"Updater failed: {out.stderr[-800:]}")
+    with open(env["UPDATE_SUMMARY_FILE"], "r") as f:
+        summary = json.load(f)
+
+    # Hanya lokasi yang benar-benar diproses (bukan yang dibawa dari run lalu)
+    processed = summary["success"] + summary["failed"] + summary["skipped"]
+    elapsed = summary["elapsed_seconds"]
+    return {
+        "wall_seconds": round(wall, 2),
+        "elapsed_seconds": summary["elapsed_seconds"],
+        "locations": summary["total"],
+        "success": summary["success"],
+        "failed": summary["failed"],
+        "skipped": summary["skipped"],
+        "carried_over": summary.get("carried_over", 0),
+        "processed": processed,
+        "locations_per_second": round(processed / elapsed, 2) if processed and elapsed else None,
+        "phases": summary.get("phases"),
+        "nasa": summary.get("nasa")
+    }
+
+def median_rate(runs):
+    rates = [r["locations_per_second"] for r in runs if r["locations_per_second"] is not None]
+    return statistics.median(rates) if rates else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the updater against a local NASA POWER stub")
+    nasa_stub.add_arguments(parser)
+    parser.add_argument("--workers", type=int, default=4, help="NASA fetch workers")
+    parser.add_argument("--rate", type=float, default=1000.0, help="NASA_RATE_PER_SECOND for the run")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--warm", action="store_true", help="Keep cache/series between runs")
+    parser.add_argument("--mode", choices=["full", "selective"], default="full",
+                        help="Update mode (selective skips locations that cannot have newer data)")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    port = free_port()
+    stub = start_stub(port, args)
+    base_url = f"http://127.0.0.1:{port}"
+    runs = []
+    state_dir = None
+    try:
+        for i in range(args.runs):
+            if state_dir is None or not args.warm:
+                if state_dir:
+                    shutil.rmtree(state_dir, ignore_errors=True)
+                state_dir = tempfile.mkdtemp(prefix="tulip-updater-bench-")
+            result = run_once(state_env(state_dir, base_url, args), args.workers, args.mode)
+            runs.append(result)
+            nasa = result["nasa"] or {}
+            rate = result["locations_per_second"]
+            print(
+                f"⚙️ run {i+1}: {rate if rate is not None else '-':>7} loc/s  "
+                f"{result['elapsed_seconds']:>6.1f}s  ok {result['success']}/{result['processed']} processed, "
+                f"{result['carried_over']} carried over  "
+                f"NASA {nasa.get('requests')} req, {nasa.get('retries')} retries, {nasa.get('rate_limited')} 429"
+            )
+    finally:
+        stub.terminate()
+        stub.wait(timeout=10)
+        if state_dir:
+            shutil.rmtree(state_dir, ignore_errors=True)
+
+    report = {
+        "python": sys.version.split()[0],
+        "stub": nasa_stub.options_from(args),
+        "workers": args.workers,
+        "rate_per_second": args.rate,
+        "warm": args.warm,
+        "mode": args.mode,
+        "median_locations_per_second": median_rate(runs),
+        "runs": runs
+    }
+    if report["median_locations_per_second"] is None:
+        print(f"📊 no locations processed over {len(runs)} runs")
+    else:
+        print(f"📊 median {report['median_locations_per_second']:.2f} locations/second over {len(runs)} runs")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+# gunicorn.conf.py - Konfigurasi server produksi
+# Beberapa worker melayani request; scheduler update hanya berjalan di satu
+# worker (leader, lihat leader.py). preload_app harus tetap False agar
+# setiap worker memulai thread pemilihan leader sendiri.
+
+import os
+import shutil
+import tempfile
+import multiprocessing
+
+port = os.environ.get("PORT", 8080)
+bind = f"0.0.0.0:{port}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# Thread per worker; long-poll/SSE /events menahan satu thread per klien,
+# dibatasi EVENTS_MAX_WAITERS (default setengahnya) agar /predict tetap dilayani
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+preload_app = False
+
+# Metrik per worker ditulis ke sini dan digabung saat /metrics dirender
+# (lihat metrics.py); dikosongkan setiap kali server dimulai
+metrics_dir = os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), f"tulip-metrics-{port}"))
+
+def on_starting(server):
+    shutil.rmtree(metrics_dir, ignore_errors=True)
@@ -0,0 +1,103 @@
+# history.py - Riwayat prediksi di SQLite (WAL)
+# Satu baris per (slug, tanggal data NASA); update berikutnya untuk tanggal
+# yang sama menimpa baris itu. Dipakai updater (record) dan API (/history).
+
+import os, json, sqlite3
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HISTORY_PATH = os.environ.get("HISTORY_PATH", os.path.join(BASE_DIR, "history.sqlite"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prediction_history (
+    slug TEXT NOT NULL,
+    date TEXT NOT NULL,
+    features TEXT NOT NULL,
+    probability REAL NOT NULL,
+    percentage REAL NOT NULL,
+    status TEXT,
+    level TEXT,
+    warna TEXT,
+    model_version TEXT,
+    recorded_at TEXT NOT NULL,
+    PRIMARY KEY (slug, date)
+) WITHOUT ROWID
+"""
+
+def connect(path=HISTORY_PATH):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(SCHEMA)
+    return conn
+
+def record(rows, path=HISTORY_PATH):
+    """Store scored rows: dicts with slug, date, nasa, prediction, interpretasi"""
+    recorded_at = datetime.utcnow().isoformat() + "Z"
+    values = []
+    for row in rows:
+        interpretasi = row.get("interpretasi") or {}
+        values.append((
+            row["slug"],
+            row["date"],
+            json.dumps(row["nasa"]),
+            row["prediction"]["probabilitas"],
+            row["prediction"]["percentage"],
+            interpretasi.get("status"),
+            interpretasi.get("level"),
+            interpretasi.get("warna"),
+            (row.get("metadata") or {}).get("model_version"),
+            recorded_at
+        ))
+
+    if not values:
+        return 0
+
+    conn = connect(path)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO prediction_history VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                values
+            )
+    finally:
+        conn.close()
+    return len(values)
+
+def query(slug, date_from=None, date_to=None, limit=50, offset=0, path=HISTORY_PATH):
+    """Return (items, total) for slug between date_from and date_to (YYYYMMDD, inclusive)"""
+    if not os.path.exists(path):
+        return [], 0
+
+    where = "slug=?"
+    args = [slug]
+    if date_from:
+        where += " AND date>=?"
+        args.append(date_from)
+    if date_to:
+        where += " AND date<=?"
+        args.append(date_to)
+
+    conn = connect(path)
+    try:
+        total = conn.execute(f"SELECT COUNT(*) FROM prediction_history WHERE {where}", args).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT date, features, probability, percentage, status, level, warna, model_version, recorded_at "
+            f"FROM prediction_history WHERE {where} ORDER BY date DESC LIMIT ? OFFSET ?",
+            args + [limit, offset]
+        ).fetchall()
+    finally:
+        conn.close()
+
+    items = [
+        {
+            "date": date,
+            "nasa": json.loads(features),
+            "prediction": {"probabilitas": probability, "percentage": percentage},
+            "interpretasi": {"status": status, "warna": warna, "level": level},
+            "model_version": model_version,
+            "recorded_at": recorded_at
+        }
+        for date, features, probability, percentage, status, level, warna, model_version, recorded_at in rows
+    ]
+    return items, total
@@ -0,0 +1,83 @@
+# leader.py - Pemilihan leader antar worker gunicorn
+# Hanya proses yang memegang file lock (flock) yang menjalankan scheduler.
+# Lock dilepas otomatis oleh OS saat proses mati, sehingga worker lain
+# bisa mengambil alih. Leader menulis heartbeat + status update ke file
+# state bersama yang dibaca worker lain.
+
+import os, json, time
+
+from snapshots import write_atomic
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-Unix: satu proses saja
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LOCK_FILE = os.environ.get("SCHEDULER_LOCK_FILE", os.path.join(BASE_DIR, "scheduler.lock"))
+STATE_FILE = os.environ.get("SCHEDULER_STATE_FILE", os.path.join(BASE_DIR, "scheduler_state.json"))
+FORCE_UPDATE_FILE = os.environ.get("FORCE_UPDATE_FILE", os.path.join(BASE_DIR, "force_update.request"))
+
+HEARTBEAT_SECONDS = float(os.environ.get("LEADER_HEARTBEAT_SECONDS", 5))
+RETRY_SECONDS = float(os.environ.get("LEADER_RETRY_SECONDS", 10))
+
+class LeaderLock:
+    """Non-blocking exclusive file lock held for the life of the leader process"""
+
+    def __init__(self, path=LOCK_FILE):
+        self.path = path
+        self.fd = None
+
+    def try_acquire(self):
+        if self.fd is not None:
+            return True
+        if fcntl is None:
+            self.fd = -1
+            return True
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self.fd = fd
+        return True
+
+def write_state(**fields):
+    """Leader: publish heartbeat and update status for the other workers"""
+    state = dict(fields, pid=os.getpid(), heartbeat_at=time.time())
+    write_atomic(STATE_FILE, json.dumps(state))
+
+def read_state():
+    """Followers: last state written by the leader ({} if none)"""
+    try:
+        with open(STATE_FILE, "r") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    state["stale"] = time.time() - state.get("heartbeat_at", 0) > 3 * HEARTBEAT_SECONDS
+    return state
+
+def request_force_update(mode=None):
+    """Followers: ask the leader to run an update (optionally "full") on its next tick"""
+    write_atomic(FORCE_UPDATE_FILE, json.dumps({"requested_at": time.time(), "mode": mode}))
+
+def take_force_update_request():
+    """Leader: the pending request ({"mode": ...}) and clear it, or None"""
+    try:
+        with open(FORCE_UPDATE_FILE, "r") as f:
+            request = json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        request = {}
+    try:
+        os.remove(FORCE_UPDATE_FILE)
+    except FileNotFoundError:
+        pass
+    return request if isinstance(request, dict) else {}
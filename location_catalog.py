@@ -0,0 +1,167 @@
+# location_catalog.py - Katalog lokasi ringkas dari file kolumnar
+# Untuk katalog besar (~7.000 kecamatan se-Indonesia) lokasi tidak disimpan
+# sebagai dict per lokasi, tetapi sebagai array paralel: lat/lon float64,
+# group/parent sebagai kode kategori, plus indeks slug -> baris. Akses gaya
+# dict yang dipakai api.py (index[slug]["lat"], .items(), .get, in) tetap
+# bekerja lewat antarmuka Mapping; record dibuat saat diakses.
+#
+# Format file: CSV, NPZ, atau Parquet (butuh pyarrow), dengan kolom
+# name, lat, lon dan opsional slug, group, parent.
+
+import os, csv
+from array import array
+from collections.abc import Mapping
+
+COLUMNS = ("slug", "name", "group", "parent", "lat", "lon")
+DEFAULT_GROUP = "kecamatan"
+
+class CompactCatalog(Mapping):
+    """Parallel-array location catalog with a slug -> row index"""
+
+    __slots__ = (
+        "slugs", "names", "lat", "lon",
+        "group_codes", "parent_codes", "groups", "parents",
+        "positions", "category_codes"
+    )
+
+    def __init__(self):
+        self.slugs = []
+        self.names = []
+        self.lat = array("d")
+        self.lon = array("d")
+        self.group_codes = array("I")
+        self.parent_codes = array("I")
+        self.groups = []
+        self.parents = []
+        self.positions = {}
+        self.category_codes = ({}, {})
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from (slug, name, group, parent, lat, lon) tuples; later rows win"""
+        catalog = cls()
+        for row in rows:
+            catalog.add(*row)
+        return catalog
+
+    def code(self, kind, value):
+        codes = self.category_codes[kind]
+        values = self.groups if kind == 0 else self.parents
+        if value not in codes:
+            codes[value] = len(values)
+            values.append(value)
+        return codes[value]
+
+    def add(self, slug, name, group, parent, lat, lon):
+        group_code = self.code(0, group)
+        parent_code = self.code(1, parent)
+        i = self.positions.get(slug)
+        if i is None:
+            self.positions[slug] = len(self.slugs)
+            self.slugs.append(slug)
+            self.names.append(name)
+            self.lat.append(float(lat))
+            self.lon.append(float(lon))
+            self.group_codes.append(group_code)
+            self.parent_codes.append(parent_code)
+        else:
+            self.names[i] = name
+            self.lat[i] = float(lat)
+            self.lon[i] = float(lon)
+            self.group_codes[i] = group_code
+            self.parent_codes[i] = parent_code
+
+    def record(self, i):
+        return {
+            "name": self.names[i],
+            "group": self.groups[self.group_codes[i]],
+            "parent": self.parents[self.parent_codes[i]],
+            "lat": self.lat[i],
+            "lon": self.lon[i],
+            "slug": self.slugs[i]
+        }
+
+    def __getitem__(self, slug):
+        return self.record(self.positions[slug])
+
+    def __contains__(self, slug):
+        return slug in self.positions
+
+    def __iter__(self):
+        return iter(self.slugs)
+
+    def __len__(self):
+        return len(self.slugs)
+
+    def items(self):
+        return ((slug, self.record(i)) for i, slug in enumerate(self.slugs))
+
+    def coordinates(self):
+        """(slugs, lat, lon) columns, for vectorized consumers like SpatialIndex"""
+        return self.slugs, self.lat, self.lon
+
+def rows_from_columns(columns, slugify):
+    """Normalize a {column: sequence} mapping into catalog rows"""
+    missing = [c for c in ("name", "lat", "lon") if c not in columns]
+    if missing:
+        raise ValueError(f"Catalog file is missing columns: {', '.join(missing)}")
+
+    names = [str(n) for n in columns["name"]]
+    count = len(names)
+    slugs = [str(s) for s in columns["slug"]] if "slug" in columns else [slugify(n) for n in names]
+    groups = [str(g) for g in columns["group"]] if "group" in columns else [DEFAULT_GROUP] * count
+    parents = [str(p) for p in columns["parent"]] if "parent" in columns else [""] * count
+    return zip(slugs, names, groups, parents, columns["lat"], columns["lon"])
+
+def read_csv(path):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        columns = {name: [] for name in reader.fieldnames or []}
+        for row in reader:
+            for name in columns:
+                columns[name].append(row[name])
+    # Kolom slug kosong di CSV berarti "buat dari nama"
+    if "slug" in columns and not all(columns["slug"]):
+        del columns["slug"]
+    return columns
+
+def read_npz(path):
+    import numpy as np
+    with np.load(path, allow_pickle=False) as data:
+        return {name: data[name].tolist() for name in data.files}
+
+def read_parquet(path):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet catalogs need pyarrow (pip install pyarrow)")
+    return pq.read_table(path).to_pydict()
+
+READERS = {".csv": read_csv, ".npz": read_npz, ".parquet": read_parquet}
+
+def load_catalog_file(path, slugify):
+    """Load a CSV / NPZ / Parquet catalog into a CompactCatalog"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in READERS:
+        raise ValueError(f"Unsupported catalog format {ext!r} (use {', '.join(READERS)})")
+    return CompactCatalog.from_rows(rows_from_columns(READERS[ext](path), slugify))
+
+def export_catalog(index, path):
+    """Write any {slug: location} mapping as a CSV or NPZ catalog file"""
+    rows = [(slug, loc["name"], loc["group"], loc["parent"], loc["lat"], loc["lon"]) for slug, loc in index.items()]
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            writer.writerows(rows)
+    elif ext == ".npz":
+        import numpy as np
+        columns = list(zip(*rows)) if rows else [[] for _ in COLUMNS]
+        np.savez_compressed(path, **{
+            name: np.array(values, dtype=float if name in ("lat", "lon") else str)
+            for name, values in zip(COLUMNS, columns)
+        })
+    else:
+        raise ValueError(f"Unsupported export format {ext!r} (use .csv or .npz)")
+    return len(rows)
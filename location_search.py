@@ -0,0 +1,124 @@
+# location_search.py - Indeks pencarian slug/nama lokasi untuk jalur 404
+# Dibangun sekali dari LOCATION_INDEX + alias, dan hanya dibangun ulang
+# bila katalog lokasi berubah. Resolusi alias O(1), saran memakai prefix,
+# n-gram (trigram) dan edit distance.
+
+import re
+import threading
+from bisect import bisect_left
+
+GRAM_SIZE = 3
+MAX_CANDIDATES = 50
+
+def normalize(text):
+    """Lowercase, spaces/underscores to dashes, drop other punctuation"""
+    text = text.strip().lower().replace("_", "-").replace(" ", "-")
+    text = re.sub(r"[^a-z0-9-]", "", text)
+    return re.sub(r"-+", "-", text).strip("-")
+
+def compact(text):
+    """Normalized form without dashes, so 'pare-pare' matches 'parepare'"""
+    return normalize(text).replace("-", "")
+
+def grams(text):
+    padded = f"^{text}$"
+    return {padded[i:i + GRAM_SIZE] for i in range(max(1, len(padded) - GRAM_SIZE + 1))}
+
+def edit_distance(a, b, limit=None):
+    """Levenshtein distance, stopping early once every row exceeds limit"""
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb)
+            ))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+class LocationSearch:
+    """Lookup index over slugs, names and aliases"""
+
+    def __init__(self, index, aliases=None):
+        self.exact = {}
+        for slug, loc in index.items():
+            for term in (slug, loc["name"]):
+                self.exact.setdefault(compact(term), slug)
+        for alias, slug in (aliases or {}).items():
+            if slug in index:
+                self.exact[compact(alias)] = slug
+
+        self.terms = sorted(self.exact)
+        self.gram_index = {}
+        for term in self.terms:
+            for gram in grams(term):
+                self.gram_index.setdefault(gram, []).append(term)
+
+    def resolve(self, query):
+        """Exact slug / name / alias match, or None"""
+        return self.exact.get(compact(query))
+
+    def candidates(self, term):
+        found = {}
+
+        # Prefix: semua term yang diawali query (dan sebaliknya, query diawali term)
+        i = bisect_left(self.terms, term)
+        while i < len(self.terms) and self.terms[i].startswith(term) and len(found) < MAX_CANDIDATES:
+            found[self.terms[i]] = MAX_CANDIDATES
+            i += 1
+
+        counts = {}
+        for gram in grams(term):
+            for t in self.gram_index.get(gram, ()):
+                counts[t] = counts.get(t, 0) + 1
+        for t, count in sorted(counts.items(), key=lambda item: -item[1])[:MAX_CANDIDATES]:
+            found.setdefault(t, count)
+        return found
+
+    def suggest(self, query, limit=5):
+        """Ranked slugs for a query that did not resolve"""
+        term = compact(query)
+        if not term:
+            return []
+
+        max_distance = max(2, len(term) // 2)
+        ranked = []
+        for t, shared in self.candidates(term).items():
+            prefix = t.startswith(term) or term.startswith(t)
+            contains = term in t
+            distance = edit_distance(term, t, limit=None if prefix or contains else max_distance)
+            if not prefix and not contains and distance > max_distance:
+                continue
+            ranked.append((not prefix, not contains, distance, -shared, t))
+
+        slugs = []
+        for *_, t in sorted(ranked):
+            slug = self.exact[t]
+            if slug not in slugs:
+                slugs.append(slug)
+            if len(slugs) >= limit:
+                break
+        return slugs
+
+_SEARCH = None
+_SEARCH_KEY = None
+_SEARCH_LOCK = threading.Lock()
+
+def get_search(index, aliases=None):
+    """Shared index, rebuilt only when the catalog or alias table changes"""
+    global _SEARCH, _SEARCH_KEY
+    key = (id(index), len(index), id(aliases), len(aliases or {}))
+    if _SEARCH is None or _SEARCH_KEY != key:
+        with _SEARCH_LOCK:
+            if _SEARCH is None or _SEARCH_KEY != key:
+                _SEARCH = LocationSearch(index, aliases)
+                _SEARCH_KEY = key
+    return _SEARCH
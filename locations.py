@@ -1,7 +1,26 @@
 # locations.py - FINAL VERSION
-# Menggunakan data dari raw_locations.py yang sudah disesuaikan
+# Menggunakan data dari raw_locations.py yang sudah disesuaikan.
+# Import bersifat senyap: katalog dibaca dari cache terkompilasi
+# (.locations_cache.pickle) selama raw_locations.py tidak berubah.
+# Validasi lokasi Laravel dijalankan eksplisit: python locations.py
+#
+# LOCATIONS_FILE=kecamatan.csv (atau .npz / .parquet) memuat katalog dari
+# file kolumnar ke CompactCatalog (location_catalog.py) sebagai ganti
+# raw_locations.py; akses gaya dict tetap sama. Konversi katalog saat ini:
+#   python locations.py --export kecamatan.csv
+
+import os, sys, time, pickle, argparse
+
+from location_catalog import load_catalog_file, export_catalog
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RAW_LOCATIONS_FILE = os.path.join(BASE_DIR, "raw_locations.py")
+CATALOG_CACHE_FILE = os.environ.get("LOCATIONS_CACHE_FILE", os.path.join(BASE_DIR, ".locations_cache.pickle"))
+CATALOG_CACHE_VERSION = 2
+LOCATIONS_FILE = os.environ.get("LOCATIONS_FILE")
 
 LOCATION_INDEX = {}
+LOCATION_ALIASES = {}
 
 def slugify(name):
     """Convert name to slug format (lowercase, replace spaces with dash)"""
@@ -20,57 +39,135 @@ def register(group, parent, data):
             "slug": slug
         }
 
-# === LOAD DATA DARI RAW_LOCATIONS ===
-try:
-    from raw_locations import DEFAULT_LOCATIONS, SULSEL, KECAMATAN
-    
-    # Register data
-    register("default", "Nasional", DEFAULT_LOCATIONS)
-    register("sulsel", "Sulawesi Selatan", SULSEL)
-    
-    for kab, data in KECAMATAN.items():
-        register("kecamatan", kab, data)
-    
-    print(f"✅ Successfully loaded {len(LOCATION_INDEX)} locations")
-    
-    # Debug: Show first 5 locations
-    print("📋 Sample locations:")
-    for i, (slug, loc) in enumerate(list(LOCATION_INDEX.items())[:5]):
-        print(f"  {i+1}. {loc['name']} -> {slug}")
-    
-except ImportError as e:
-    print(f"❌ Error: {e}")
-    print("Using minimal fallback data...")
-    
-    # Fallback minimal data
-    FALLBACK_DATA = {
-        "Parepare": (-4.0096, 119.6236),
-        "Makassar": (-5.1477, 119.4327),
-    }
-    
-    register("sulsel", "Sulawesi Selatan", FALLBACK_DATA)
-    print(f"⚠️ Using {len(LOCATION_INDEX)} fallback locations")
+def source_file():
+    return os.path.abspath(LOCATIONS_FILE) if LOCATIONS_FILE else RAW_LOCATIONS_FILE
+
+def source_signature():
+    """Identifies the catalog source (LOCATIONS_FILE or raw_locations.py) the cache was built from"""
+    path = source_file()
+    try:
+        st = os.stat(path)
+        return (CATALOG_CACHE_VERSION, path, st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+def load_cached_catalog(signature):
+    try:
+        with open(CATALOG_CACHE_FILE, "rb") as f:
+            cached = pickle.load(f)
+        if cached.get("signature") == signature:
+            return cached
+    except Exception:
+        pass
+    return None
+
+def save_cached_catalog(signature):
+    tmp = f"{CATALOG_CACHE_FILE}.tmp-{os.getpid()}"
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump({
+                "signature": signature,
+                "index": LOCATION_INDEX,
+                "aliases": LOCATION_ALIASES
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, CATALOG_CACHE_FILE)
+    except OSError:
+        # Cache hanya optimasi; direktori read-only tidak masalah
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+def build_catalog():
+    """Register everything from raw_locations (or the minimal fallback)"""
+    try:
+        from raw_locations import DEFAULT_LOCATIONS, SULSEL, KECAMATAN
+
+        # Register data
+        register("default", "Nasional", DEFAULT_LOCATIONS)
+        register("sulsel", "Sulawesi Selatan", SULSEL)
+
+        for kab, data in KECAMATAN.items():
+            register("kecamatan", kab, data)
+
+        load_aliases()
+        return True
+
+    except ImportError as e:
+        print(f"❌ Error: {e}")
+        print("Using minimal fallback data...")
+
+        # Fallback minimal data
+        FALLBACK_DATA = {
+            "Parepare": (-4.0096, 119.6236),
+            "Makassar": (-5.1477, 119.4327),
+        }
+
+        register("sulsel", "Sulawesi Selatan", FALLBACK_DATA)
+        print(f"⚠️ Using {len(LOCATION_INDEX)} fallback locations")
+        return False
+
+def load_aliases():
+    try:
+        from raw_locations import ALIASES
+        LOCATION_ALIASES.update(ALIASES)
+    except ImportError:
+        pass
+
+def build_file_catalog():
+    """Load LOCATIONS_FILE into a CompactCatalog"""
+    global LOCATION_INDEX
+    try:
+        LOCATION_INDEX = load_catalog_file(LOCATIONS_FILE, slugify)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"❌ Error loading LOCATIONS_FILE {LOCATIONS_FILE}: {e}")
+        print("Falling back to raw_locations.py...")
+        build_catalog()
+        return False
+    load_aliases()
+    return True
+
+def load_catalog():
+    global LOCATION_INDEX
+    signature = source_signature()
+    cached = load_cached_catalog(signature) if signature else None
+    if cached:
+        if LOCATIONS_FILE:
+            LOCATION_INDEX = cached["index"]
+        else:
+            LOCATION_INDEX.update(cached["index"])
+        LOCATION_ALIASES.update(cached["aliases"])
+        return
+
+    built = build_file_catalog() if LOCATIONS_FILE else build_catalog()
+    if built and signature:
+        save_cached_catalog(signature)
+
+# === LOAD DATA (dari cache, LOCATIONS_FILE atau RAW_LOCATIONS) ===
+_started = time.perf_counter()
+load_catalog()
+LOAD_SECONDS = time.perf_counter() - _started
 
 # === VALIDATION: Cek apakah semua lokasi Laravel ada ===
+LARAVEL_LOCATIONS = [
+    "jakarta-selatan", "luwu-timur", "sinjai", "pangkep", "luwu",
+    "duampanua", "pinrang", "makassar", "soreang", "jakarta-timur",
+    "barru", "takalar", "balusu", "soppeng", "bacukiki-barat",
+    "bacukiki", "watang-sawitto", "parepare", "enrekang", "sidrap",
+    "jakarta-utara", "tana-toraja", "bone", "sukabumi", "gowa",
+    "cempa", "mallusetasi", "toraja-utara", "batulappa", "bekasi",
+    "lanrisang", "cianjur", "luwu-utara", "jeneponto", "palopo",
+    "bulukumba", "jakarta-pusat", "bogor", "jakarta-barat", "ujung",
+    "maros", "wajo", "tanete-rilau"
+]
+
 def validate_laravel_locations():
     """Validate that all Laravel locations exist in our index"""
-    laravel_locations = [
-        "jakarta-selatan", "luwu-timur", "sinjai", "pangkep", "luwu",
-        "duampanua", "pinrang", "makassar", "soreang", "jakarta-timur",
-        "barru", "takalar", "balusu", "soppeng", "bacukiki-barat",
-        "bacukiki", "watang-sawitto", "parepare", "enrekang", "sidrap",
-        "jakarta-utara", "tana-toraja", "bone", "sukabumi", "gowa",
-        "cempa", "mallusetasi", "toraja-utara", "batulappa", "bekasi",
-        "lanrisang", "cianjur", "luwu-utara", "jeneponto", "palopo",
-        "bulukumba", "jakarta-pusat", "bogor", "jakarta-barat", "ujung",
-        "maros", "wajo", "tanete-rilau"
-    ]
-    
     missing = []
-    for loc in laravel_locations:
+    for loc in LARAVEL_LOCATIONS:
         if loc not in LOCATION_INDEX:
             missing.append(loc)
-    
+
     if missing:
         print(f"⚠️ Warning: {len(missing)} Laravel locations not found:")
         for loc in missing[:10]:  # Show first 10 only
@@ -79,10 +176,27 @@ def validate_laravel_locations():
             print(f"  ... and {len(missing)-10} more")
     else:
         print("✅ All Laravel locations are available!")
-    
+
     return len(missing) == 0
 
-# Run validation
-validate_laravel_locations()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate or export the location catalog")
+    parser.add_argument("--export", metavar="PATH", help="Write the catalog as .csv or .npz (for LOCATIONS_FILE)")
+    args = parser.parse_args()
+
+    if args.export:
+        count = export_catalog(LOCATION_INDEX, args.export)
+        print(f"💾 Exported {count} locations to {args.export}")
+        sys.exit(0)
+
+    print(f"✅ Successfully loaded {len(LOCATION_INDEX)} locations "
+          f"({type(LOCATION_INDEX).__name__} from {source_file()} in {LOAD_SECONDS * 1000:.1f} ms)")
+
+    # Debug: Show first 5 locations
+    print("📋 Sample locations:")
+    for i, (slug, loc) in enumerate(list(LOCATION_INDEX.items())[:5]):
+        print(f"  {i+1}. {loc['name']} -> {slug}")
 
-print(f"📊 Total registered locations: {len(LOCATION_INDEX)}")
\ No newline at end of file
+    ok = validate_laravel_locations()
+    print(f"📊 Total registered locations: {len(LOCATION_INDEX)}")
+    sys.exit(0 if ok else 1)
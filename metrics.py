@@ -0,0 +1,283 @@
+# metrics.py - Metrik ringan dalam format teks Prometheus (tanpa dependensi)
+# Counter, Gauge dan Histogram berlabel disimpan di memori proses dan
+# dirender oleh endpoint /metrics di api.py.
+#
+# Dengan beberapa worker gunicorn, METRICS_DIR diisi (gunicorn.conf.py):
+# setiap proses menulis counter/histogram-nya ke METRICS_DIR/<pid>.json
+# (berkala dan saat render), dan render menjumlahkan semua file, sehingga
+# scrape ke worker mana pun memberi angka yang sama dan tidak mundur.
+# File worker yang sudah mati tetap dihitung. Gauge tidak digabung: metrik
+# update terakhir dibaca api.py dari update_summary.json di setiap worker.
+
+import os
+import json
+import atexit
+import bisect
+import threading
+import time
+
+METRICS_DIR = os.environ.get("METRICS_DIR")
+METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", 5))
+
+# Bucket latensi (detik): request HTTP cepat sampai panggilan NASA lambat
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Bucket durasi fase update (detik), sampai batas UPDATE_TIMEOUT_SECONDS
+PHASE_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 180, 240, 300, 600)
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}"
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def describe(self):
+        return {"kind": self.kind, "help": self.help, "labelnames": list(self.labelnames)}
+
+    def snapshot(self):
+        """[[label values, value]] copy of this process's values"""
+        with self.lock:
+            return [[list(k), v] for k, v in self.values.items()]
+
+    def merge(self, merged, values):
+        for key, value in values:
+            key = tuple(key)
+            merged[key] = merged.get(key, 0) + value
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self.lock:
+            return self.values.get(self.key(labels), 0)
+
+    def total(self):
+        with self.lock:
+            return sum(self.values.values())
+
+    def render(self, values=None):
+        if values is None:
+            with self.lock:
+                values = dict(self.values)
+        items = sorted(values.items())
+        return self.header() + [
+            f"{self.name}{format_labels(self.labelnames, k)} {format_value(v)}"
+            for k, v in items
+        ]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def describe(self):
+        return dict(super().describe(), buckets=list(self.buckets))
+
+    def snapshot(self):
+        with self.lock:
+            return [[list(k), [list(b), s, c]] for k, (b, s, c) in self.values.items()]
+
+    def merge(self, merged, values):
+        for key, (counts, total, count) in values:
+            key = tuple(key)
+            entry = merged.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            entry[0] = [a + b for a, b in zip(entry[0], counts)]
+            entry[1] += total
+            entry[2] += count
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            idx = bisect.bisect_left(self.buckets, value)
+            if idx < len(self.buckets):
+                entry[0][idx] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def totals(self, **match):
+        """(sum, count) over every label set matching the given labels"""
+        with self.lock:
+            items = list(self.values.items())
+        total, count = 0.0, 0
+        for key, (_, s, c) in items:
+            labels = dict(zip(self.labelnames, key))
+            if all(labels.get(k) == str(v) for k, v in match.items()):
+                total += s
+                count += c
+        return total, count
+
+    def render(self, values=None):
+        if values is None:
+            with self.lock:
+                values = {k: (list(b), s, c) for k, (b, s, c) in self.values.items()}
+        items = sorted(values.items())
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                labels = format_labels(self.labelnames, key, [("le", format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labelnames, key, [("le", "+Inf")])
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            plain = format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{plain} {format_value(total)}")
+            lines.append(f"{self.name}_count{plain} {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            # Idempotent: modul yang di-reload memakai metrik yang sama
+            return self.metrics.setdefault(metric.name, metric)
+
+    def dump(self, directory):
+        """Write this process's counters and histograms to directory/<pid>.json"""
+        with self.lock:
+            metrics = [m for m in self.metrics.values() if m.kind != "gauge"]
+        data = {m.name: dict(m.describe(), values=m.snapshot()) for m in metrics}
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def collect(self, directory):
+        """{name: (metric, merged values)} summed over every process file"""
+        with self.lock:
+            known = dict(self.metrics)
+        merged = {}
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(directory, name), "r") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for metric_name, entry in data.items():
+                if metric_name not in merged:
+                    metric = known.get(metric_name) or from_description(metric_name, entry)
+                    if metric is None:
+                        continue
+                    merged[metric_name] = (metric, {})
+                metric, values = merged[metric_name]
+                metric.merge(values, entry["values"])
+        return merged
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        merged = {}
+        if METRICS_DIR:
+            self.dump(METRICS_DIR)
+            merged = self.collect(METRICS_DIR)
+
+        lines = []
+        for metric in metrics:
+            if metric.name in merged:
+                lines.extend(metric.render(merged.pop(metric.name)[1]))
+            else:
+                lines.extend(metric.render())
+        # Metrik yang hanya ada di proses lain (mis. NASA di worker leader)
+        for metric, values in merged.values():
+            lines.extend(metric.render(values))
+        return "\n".join(lines) + "\n"
+
+def from_description(name, entry):
+    if entry.get("kind") == "counter":
+        return Counter(name, entry["help"], entry["labelnames"])
+    if entry.get("kind") == "histogram":
+        return Histogram(name, entry["help"], entry["labelnames"], entry["buckets"])
+    return None
+
+REGISTRY = Registry()
+_FLUSHER = None
+
+def counter(name, help, labelnames=()):
+    return REGISTRY.register(Counter(name, help, labelnames))
+
+def gauge(name, help, labelnames=()):
+    return REGISTRY.register(Gauge(name, help, labelnames))
+
+def histogram(name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+def render():
+    return REGISTRY.render()
+
+def start_flusher(interval=METRICS_FLUSH_SECONDS):
+    """Periodically dump this process's metrics to METRICS_DIR (no-op when unset)"""
+    global _FLUSHER
+    if not METRICS_DIR or _FLUSHER is not None:
+        return
+
+    def flush():
+        try:
+            REGISTRY.dump(METRICS_DIR)
+        except OSError:
+            pass
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            flush()
+
+    flush()
+    atexit.register(flush)
+    _FLUSHER = threading.Thread(target=loop, daemon=True, name="metrics-flush")
+    _FLUSHER.start()
@@ -0,0 +1,125 @@
+# nasa_cache.py - Cache respons NASA POWER di disk (SQLite)
+# Satu baris per (lat, lon, parameter set, tanggal) sehingga run berikutnya
+# hanya meminta tanggal yang belum ada atau sudah kedaluwarsa.
+
+import os, json, time, sqlite3, threading
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+NASA_CACHE_PATH = os.environ.get("NASA_CACHE_PATH", os.path.join(BASE_DIR, "nasa_cache.sqlite"))
+NASA_CACHE_ENABLED = os.environ.get("NASA_CACHE_ENABLED", "1") != "0"
+
+# Tanggal yang masih baru (atau masih berisi -999) bisa berubah di NASA,
+# jadi disimpan sebentar saja. Tanggal lama dianggap sudah final.
+RECENT_TTL_HOURS = float(os.environ.get("NASA_CACHE_RECENT_TTL_HOURS", 3))
+SETTLED_TTL_DAYS = float(os.environ.get("NASA_CACHE_SETTLED_TTL_DAYS", 30))
+SETTLED_AFTER_DAYS = int(os.environ.get("NASA_CACHE_SETTLED_AFTER_DAYS", 5))
+MAX_ENTRIES = int(os.environ.get("NASA_CACHE_MAX_ENTRIES", 50000))
+
+MISSING = -999
+
+class NasaCache:
+    """Disk-backed per-day cache of NASA POWER values with TTL and LRU eviction"""
+
+    def __init__(self, path=NASA_CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS nasa_daily (
+                lat REAL NOT NULL,
+                lon REAL NOT NULL,
+                params TEXT NOT NULL,
+                date TEXT NOT NULL,
+                vals TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (lat, lon, params, date)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_nasa_daily_accessed ON nasa_daily (accessed_at)")
+        self.conn.commit()
+
+    @staticmethod
+    def key(lat, lon, features):
+        return round(float(lat), 4), round(float(lon), 4), ",".join(features)
+
+    @staticmethod
+    def ttl_seconds(date, vals, now=None):
+        """TTL for one day of data: short for recent or incomplete days, long for settled ones"""
+        now = now or datetime.utcnow()
+        try:
+            age_days = (now - datetime.strptime(date, "%Y%m%d")).days
+        except ValueError:
+            age_days = 0
+
+        complete = all(v is not None and v != MISSING for v in vals.values())
+        if complete and age_days > SETTLED_AFTER_DAYS:
+            return SETTLED_TTL_DAYS * 86400
+        return RECENT_TTL_HOURS * 3600
+
+    def get_many(self, lat, lon, features, dates):
+        """Return {date: {feature: value}} for the cached, unexpired dates"""
+        lat, lon, params = self.key(lat, lon, features)
+        now = time.time()
+        found = {}
+
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT date, vals FROM nasa_daily WHERE lat=? AND lon=? AND params=? "
+                f"AND expires_at>? AND date IN ({','.join('?' * len(dates))})",
+                (lat, lon, params, now, *dates)
+            ).fetchall()
+
+            for date, vals in rows:
+                found[date] = json.loads(vals)
+
+            if found:
+                self.conn.executemany(
+                    "UPDATE nasa_daily SET accessed_at=? WHERE lat=? AND lon=? AND params=? AND date=?",
+                    [(now, lat, lon, params, d) for d in found]
+                )
+                self.conn.commit()
+
+        return found
+
+    def put_many(self, lat, lon, features, rows):
+        """Store {date: {feature: value}} and evict expired / least recently used rows"""
+        if not rows:
+            return
+
+        lat, lon, params = self.key(lat, lon, features)
+        now = time.time()
+        utcnow = datetime.utcnow()
+
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO nasa_daily VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (lat, lon, params, date, json.dumps(vals), now + self.ttl_seconds(date, vals, utcnow), now)
+                    for date, vals in rows.items()
+                ]
+            )
+            self.conn.execute("DELETE FROM nasa_daily WHERE expires_at<=?", (now,))
+
+            count = self.conn.execute("SELECT COUNT(*) FROM nasa_daily").fetchone()[0]
+            if count > self.max_entries:
+                self.conn.execute(
+                    "DELETE FROM nasa_daily WHERE rowid IN "
+                    "(SELECT rowid FROM nasa_daily ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self.conn.commit()
+
+def open_cache():
+    """Open the configured cache, or None when disabled / unavailable"""
+    if not NASA_CACHE_ENABLED:
+        return None
+    try:
+        return NasaCache()
+    except Exception as e:
+        print(f"⚠️ NASA cache disabled: {e}")
+        return None
@@ -0,0 +1,239 @@
+# nasa_client.py - Klien NASA POWER bersama (updater dan risk_grid)
+# Satu rate limiter, anggaran retry dan circuit breaker per proses untuk
+# semua request NASA, plus metrik request (dirender di /metrics). Request
+# HTTP-nya sendiri lewat nasa_transport.get().
+
+import os, time, random, threading, logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+
+import metrics
+import nasa_transport
+
+# Memakai logger updater supaya log NASA tetap masuk update.log
+logger = logging.getLogger("update_predictions")
+
+# Batas laju (request per detik) yang dibagi oleh semua thread
+NASA_RATE_PER_SECOND = float(os.environ.get("NASA_RATE_PER_SECOND", 1.5))
+
+class RateLimiter:
+    """Token bucket shared by all fetch threads"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request slot is available"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+RATE_LIMITER = RateLimiter(NASA_RATE_PER_SECOND)
+
+# Metrik request NASA
+NASA_REQUEST_SECONDS = metrics.histogram(
+    "tulip_nasa_request_seconds", "NASA POWER request latency", ("endpoint", "status")
+)
+NASA_RETRIES = metrics.counter("tulip_nasa_retries_total", "NASA POWER request retries", ("endpoint",))
+NASA_RATE_LIMITED = metrics.counter("tulip_nasa_rate_limited_total", "NASA POWER 429 responses", ("endpoint",))
+NASA_CIRCUIT_OPENS = metrics.counter("tulip_nasa_circuit_opens_total", "Times the NASA circuit breaker opened")
+
+# Kebijakan retry NASA: backoff dengan jitter, anggaran retry per run,
+# dan circuit breaker setelah beberapa kegagalan berturut-turut
+NASA_BACKOFF_BASE_SECONDS = float(os.environ.get("NASA_BACKOFF_BASE_SECONDS", 2))
+NASA_BACKOFF_MAX_SECONDS = float(os.environ.get("NASA_BACKOFF_MAX_SECONDS", 30))
+NASA_RETRY_BUDGET = int(os.environ.get("NASA_RETRY_BUDGET", 30))
+NASA_CIRCUIT_THRESHOLD = int(os.environ.get("NASA_CIRCUIT_THRESHOLD", 5))
+NASA_CIRCUIT_COOLDOWN_SECONDS = float(os.environ.get("NASA_CIRCUIT_COOLDOWN_SECONDS", 60))
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff for the given (0-based) attempt"""
+    return random.uniform(0, min(NASA_BACKOFF_MAX_SECONDS, NASA_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+def retry_after_seconds(response):
+    """Retry-After from a 429 (seconds or HTTP date), capped; backoff if absent"""
+    value = (response.headers or {}).get("Retry-After")
+    if value:
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                seconds = None
+        if seconds is not None:
+            return min(NASA_BACKOFF_MAX_SECONDS, max(0.0, seconds))
+    return backoff_delay(1)
+
+class RetryBudget:
+    """Retries and time left for the current run, shared by all fetch threads"""
+
+    def __init__(self, retries=None, deadline=None):
+        self.lock = threading.Lock()
+        self.reset(retries, deadline)
+
+    def reset(self, retries=None, deadline=None):
+        with self.lock:
+            self.remaining = retries
+            self.deadline = deadline
+
+    def take(self):
+        with self.lock:
+            if self.remaining is None:
+                return True
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+    def time_left(self):
+        return None if self.deadline is None else self.deadline - time.time()
+
+    def timeout(self, default):
+        """Request timeout that does not run past the deadline"""
+        left = self.time_left()
+        return default if left is None else max(1.0, min(default, left))
+
+    def sleep(self, seconds):
+        """Sleep unless that would pass the deadline; False when it would"""
+        left = self.time_left()
+        if left is not None and seconds >= left:
+            return False
+        time.sleep(seconds)
+        return True
+
+class CircuitBreaker:
+    """Stops calling NASA after `threshold` consecutive failures
+    
+    While open, one probe request is let through every `cooldown` seconds;
+    a success closes the circuit again.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            if self.opened_at is not None:
+                logger.info("🔌 NASA circuit closed")
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.threshold and self.failures >= self.threshold and self.opened_at is None:
+                self.opened_at = time.monotonic()
+                NASA_CIRCUIT_OPENS.inc()
+                logger.error(f"🔌 NASA circuit opened after {self.failures} consecutive failures, using existing data")
+
+RETRY_BUDGET = RetryBudget()
+CIRCUIT = CircuitBreaker(NASA_CIRCUIT_THRESHOLD, NASA_CIRCUIT_COOLDOWN_SECONDS)
+
+def request_json(url, params, endpoint, retry=3, timeout=60, validate=None):
+    """GET a NASA POWER endpoint and return the parsed JSON, or None
+    
+    Retries go through the run-wide RETRY_BUDGET (count and deadline) with
+    jittered backoff, honoring Retry-After on 429. While CIRCUIT is open no
+    request is made at all, so callers fall back to existing data at once.
+    validate(payload) may return an error message to reject a response.
+    """
+    headers = {
+        "User-Agent": "TULIP-SC/1.0",
+        "Accept": "application/json"
+    }
+    
+    for attempt in range(retry):
+        if not CIRCUIT.allow():
+            logger.warning(f"🔌 NASA circuit open, skipping {endpoint} request")
+            return None
+        if attempt:
+            if not RETRY_BUDGET.take():
+                logger.warning("🪫 NASA retry budget exhausted for this run")
+                break
+            NASA_RETRIES.inc(endpoint=endpoint)
+        
+        wait = None
+        try:
+            RATE_LIMITER.acquire()
+            started = time.perf_counter()
+            try:
+                response = nasa_transport.get(
+                    url,
+                    params=params,
+                    headers=headers,
+                    timeout=RETRY_BUDGET.timeout(timeout)
+                )
+            except requests.exceptions.RequestException:
+                NASA_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, status="error")
+                raise
+            NASA_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, status=response.status_code)
+            
+            if response.status_code == 429:
+                NASA_RATE_LIMITED.inc(endpoint=endpoint)
+                CIRCUIT.record_failure()
+                wait = retry_after_seconds(response)
+                logger.warning(f"⚠️ Rate limited (attempt {attempt+1})")
+            elif response.status_code >= 500:
+                CIRCUIT.record_failure()
+                logger.error(f"❌ NASA API error {response.status_code} (attempt {attempt+1})")
+            elif response.status_code != 200:
+                # 4xx lain tidak akan berubah dengan retry
+                logger.error(f"❌ NASA API error {response.status_code}")
+                return None
+            else:
+                CIRCUIT.record_success()
+                payload = response.json()
+                problem = validate(payload) if validate else None
+                if not problem:
+                    return payload
+                logger.warning(f"⚠️ {problem}")
+                continue
+            
+        except requests.exceptions.RequestException as e:
+            CIRCUIT.record_failure()
+            logger.error(f"🌐 Request failed (attempt {attempt+1}): {e}")
+        except Exception as e:
+            logger.error(f"🔥 Unexpected error: {e}")
+        
+        if attempt < retry - 1:
+            wait = backoff_delay(attempt) if wait is None else wait
+            logger.info(f"⏳ Waiting {wait:.1f}s before retry...")
+            if not RETRY_BUDGET.sleep(wait):
+                logger.warning("⏰ Not enough time left before the deadline to retry")
+                break
+    
+    logger.error(f"❌ NASA {endpoint} request failed after {attempt+1} attempt(s)")
+    return None
@@ -0,0 +1,132 @@
+# nasa_regional.py - Fetch bulk lewat endpoint regional NASA POWER
+# Satu bounding box dipecah menjadi tile 2..10 derajat (batas endpoint
+# regional), setiap tile/grup parameter diambil dengan satu request, lalu
+# titik grid native bisa di-sampling ke koordinat sembarang (nearest).
+# Dipakai oleh risk_grid (peta risiko) dan updater (NASA_FETCH_MODE=regional).
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import nasa_transport
+from nasa_client import logger, request_json
+
+NASA_REGIONAL_URL = nasa_transport.endpoint_url("/api/temporal/daily/regional")
+
+# Batas endpoint regional POWER: setiap sisi bounding box 2..10 derajat
+REGIONAL_MIN_SPAN = 2.0
+REGIONAL_MAX_SPAN = 10.0
+# Jumlah parameter per request regional
+REGIONAL_PARAMS_PER_REQUEST = int(os.environ.get("NASA_REGIONAL_PARAMS_PER_REQUEST", 1))
+
+MISSING = -999
+
+def split_bbox(bbox, max_span=REGIONAL_MAX_SPAN, min_span=REGIONAL_MIN_SPAN):
+    """Split a bbox into regional-endpoint sized tiles (each side min_span..max_span)"""
+    min_lon, min_lat, max_lon, max_lat = bbox
+
+    def edges(lo, hi):
+        count = max(1, int(np.ceil((hi - lo) / max_span)))
+        step = (hi - lo) / count
+        out = []
+        for i in range(count):
+            a, b = lo + i * step, lo + (i + 1) * step
+            if b - a < min_span:
+                pad = (min_span - (b - a)) / 2
+                a, b = a - pad, b + pad
+            out.append((round(a, 4), round(b, 4)))
+        return out
+
+    return [
+        (lon_lo, lat_lo, lon_hi, lat_hi)
+        for lat_lo, lat_hi in edges(min_lat, max_lat)
+        for lon_lo, lon_hi in edges(min_lon, max_lon)
+    ]
+
+def request_regional(tile, parameters, start, end, retry=3):
+    """One regional request; returns the GeoJSON features list or None"""
+    min_lon, min_lat, max_lon, max_lat = tile
+    params = {
+        "parameters": ",".join(parameters),
+        "community": "AG",
+        "latitude-min": min_lat,
+        "latitude-max": max_lat,
+        "longitude-min": min_lon,
+        "longitude-max": max_lon,
+        "start": start.strftime("%Y%m%d"),
+        "end": end.strftime("%Y%m%d"),
+        "format": "JSON"
+    }
+    logger.info(f"🛰️ Regional fetch {tile} {','.join(parameters)}")
+    r = request_json(NASA_REGIONAL_URL, params, "regional", retry=retry, timeout=180)
+    return None if r is None else r.get("features") or []
+
+def fetch_regional(bbox, start, end, parameters, max_workers=1):
+    """Fetch a region in bulk
+
+    Returns {feature: (lats, lons, {date: values})} with one entry per native
+    grid point of that feature; values are NaN where NASA reports -999.
+    With max_workers > 1 the tile/parameter requests run concurrently
+    (still paced by the shared rate limiter).
+    """
+    points = {f: {} for f in parameters}
+    groups = [
+        parameters[i:i + REGIONAL_PARAMS_PER_REQUEST]
+        for i in range(0, len(parameters), REGIONAL_PARAMS_PER_REQUEST)
+    ]
+    requests_plan = [(tile, group) for tile in split_bbox(bbox) for group in groups]
+
+    def run(task):
+        return request_regional(task[0], task[1], start, end)
+
+    if max_workers > 1 and len(requests_plan) > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(requests_plan)), thread_name_prefix="regional") as pool:
+            responses = list(pool.map(run, requests_plan))
+    else:
+        responses = [run(task) for task in requests_plan]
+
+    for (tile, _), features in zip(requests_plan, responses):
+        if features is None:
+            raise RuntimeError(f"Regional fetch failed for tile {tile}")
+        for feature in features:
+            lon, lat = feature["geometry"]["coordinates"][:2]
+            for f, series in feature["properties"]["parameter"].items():
+                if f in points:
+                    points[f][(round(lat, 4), round(lon, 4))] = series
+
+    out = {}
+    for f, by_point in points.items():
+        keys = list(by_point.keys())
+        dates = sorted({d for series in by_point.values() for d in series})
+        values = {}
+        for d in dates:
+            column = np.array([by_point[k].get(d, MISSING) for k in keys], dtype=float)
+            column[column == MISSING] = np.nan
+            values[d] = column
+        out[f] = (
+            np.array([k[0] for k in keys], dtype=float),
+            np.array([k[1] for k in keys], dtype=float),
+            values
+        )
+    return out
+
+def nearest_index(axis, values):
+    """Index of the nearest axis entry (axis sorted ascending) for each value"""
+    idx = np.clip(np.searchsorted(axis, values), 1, len(axis) - 1)
+    left = axis[idx - 1]
+    right = axis[idx]
+    return np.where(np.abs(values - left) <= np.abs(right - values), idx - 1, idx)
+
+def sample_points(native, lats, lons, date):
+    """Sample one feature on arbitrary (lats, lons) from its native grid points"""
+    native_lat, native_lon, values = native
+    if date not in values or not len(native_lat):
+        return np.full(len(lats), np.nan)
+
+    lat_axis = np.unique(native_lat)
+    lon_axis = np.unique(native_lon)
+    cube = np.full((len(lat_axis), len(lon_axis)), np.nan)
+    cube[np.searchsorted(lat_axis, native_lat), np.searchsorted(lon_axis, native_lon)] = values[date]
+
+    return cube[nearest_index(lat_axis, lats), nearest_index(lon_axis, lons)]
@@ -0,0 +1,183 @@
+# nasa_stub.py - Server tiruan NASA POWER untuk benchmark/tes offline
+# Melayani /api/temporal/daily/point dan /api/temporal/daily/regional dengan
+# data sintetis yang deterministik (sama untuk lat/lon/tanggal yang sama),
+# dan bisa menyuntikkan latensi, respons 429 dan celah -999.
+#
+#   python nasa_stub.py --port 8765 --latency-ms 80 --rate-429 0.05 --gap-days 2
+#   NASA_POWER_BASE_URL=http://127.0.0.1:8765 python update_predictions.py
+
+import sys, json, time, random, argparse, threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+MISSING = -999
+
+# Rentang nilai sintetis per parameter
+RANGES = {
+    "PRECTOTCORR": (0.0, 45.0),
+    "T2M_MIN": (21.0, 25.0),
+    "T2M_MAX": (29.0, 35.0),
+    "RH2M": (65.0, 95.0),
+    "WS2M": (0.5, 5.0),
+    "WD2M": (0.0, 360.0),
+    "PS": (94.0, 101.5),
+    "ALLSKY_SFC_SW_DWN": (8.0, 26.0),
+}
+
+# Grid native regional (MERRA-2)
+REGIONAL_LAT_STEP = 0.5
+REGIONAL_LON_STEP = 0.625
+
+class StubConfig:
+    def __init__(self, latency_ms=50.0, jitter_ms=0.0, rate_429=0.0, retry_after=1,
+                 gap_days=2, gap_rate=0.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.gap_days = gap_days
+        self.gap_rate = gap_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "rate_limited": 0}
+
+    def roll(self):
+        with self.lock:
+            return self.rng.random()
+
+def date_range(start, end):
+    d = datetime.strptime(start, "%Y%m%d")
+    last = datetime.strptime(end, "%Y%m%d")
+    while d <= last:
+        yield d.strftime("%Y%m%d")
+        d += timedelta(days=1)
+
+def synthetic_series(config, lat, lon, parameters, dates):
+    """{parameter: {date: value}} for one point; trailing gap_days are -999"""
+    gap_from = len(dates) - config.gap_days
+    out = {}
+    for f in parameters:
+        lo, hi = RANGES.get(f, (0.0, 1.0))
+        series = {}
+        for i, d in enumerate(dates):
+            value = random.Random(f"{lat:.3f}|{lon:.3f}|{d}|{f}").uniform(lo, hi)
+            if i >= gap_from or (config.gap_rate and config.roll() < config.gap_rate):
+                value = MISSING
+            series[d] = round(value, 2)
+        out[f] = series
+    return out
+
+def regional_axis(lo, hi, step):
+    first = int(-(-lo // step))
+    last = int(hi // step)
+    return [round(i * step, 4) for i in range(first, last + 1)]
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 agar klien bisa memakai ulang koneksi (keep-alive)
+    protocol_version = "HTTP/1.1"
+    config = StubConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        config = self.config
+        url = urlparse(self.path)
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        with config.lock:
+            config.counts["requests"] += 1
+
+        delay = config.latency_ms + (config.roll() * config.jitter_ms if config.jitter_ms else 0)
+        if delay:
+            time.sleep(delay / 1000)
+
+        if config.rate_429 and config.roll() < config.rate_429:
+            with config.lock:
+                config.counts["rate_limited"] += 1
+            return self.send_json(429, {"message": "Too Many Requests"}, {"Retry-After": str(config.retry_after)})
+
+        try:
+            parameters = q["parameters"].split(",")
+            dates = list(date_range(q["start"], q["end"]))
+            if url.path.endswith("/point"):
+                lat, lon = float(q["latitude"]), float(q["longitude"])
+                payload = {
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [lon, lat, 0]},
+                    "properties": {"parameter": synthetic_series(config, lat, lon, parameters, dates)}
+                }
+            elif url.path.endswith("/regional"):
+                lats = regional_axis(float(q["latitude-min"]), float(q["latitude-max"]), REGIONAL_LAT_STEP)
+                lons = regional_axis(float(q["longitude-min"]), float(q["longitude-max"]), REGIONAL_LON_STEP)
+                payload = {
+                    "type": "FeatureCollection",
+                    "features": [
+                        {
+                            "type": "Feature",
+                            "geometry": {"type": "Point", "coordinates": [lon, lat, 0]},
+                            "properties": {"parameter": synthetic_series(config, lat, lon, parameters, dates)}
+                        }
+                        for lat in lats for lon in lons
+                    ]
+                }
+            else:
+                return self.send_json(404, {"message": f"Unknown endpoint {url.path}"})
+        except (KeyError, ValueError) as e:
+            return self.send_json(422, {"message": f"Invalid request: {e}"})
+
+        self.send_json(200, payload)
+
+def start_stub(port=0, host="127.0.0.1", **options):
+    """Start the stub in a background thread; returns (server, base_url)"""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": StubConfig(**options)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def add_arguments(parser):
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Delay per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Extra random delay (0..jitter)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Probability of a 429 response")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429")
+    parser.add_argument("--gap-days", type=int, default=2, help="Newest days reported as -999")
+    parser.add_argument("--gap-rate", type=float, default=0.0, help="Probability of a random -999 value")
+    parser.add_argument("--seed", type=int, default=0)
+
+def options_from(args):
+    return {
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "rate_429": args.rate_429,
+        "retry_after": args.retry_after,
+        "gap_days": args.gap_days,
+        "gap_rate": args.gap_rate,
+        "seed": args.seed,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local NASA POWER stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server, base_url = start_stub(args.port, args.host, **options_from(args))
+    print(f"🛰️ NASA POWER stub on {base_url} (NASA_POWER_BASE_URL={base_url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
@@ -0,0 +1,137 @@
+# nasa_transport.py - Lapisan transport HTTP untuk NASA POWER
+# Semua request NASA (point dan regional) lewat get() di sini, sehingga
+# updater bisa dijalankan tanpa jaringan:
+#   NASA_TRANSPORT=live    request langsung (default)
+#   NASA_TRANSPORT=record  request langsung + simpan respons 200 ke fixture
+#   NASA_TRANSPORT=replay  layani dari fixture, tanpa jaringan
+# NASA_POWER_BASE_URL mengarahkan request ke server lain (mis. nasa_stub.py).
+#
+# Fixture dikunci tanpa start/end: tanggal respons yang diputar ulang digeser
+# agar hari terakhir rekaman jatuh pada tanggal end yang diminta, sehingga
+# fixture lama tetap terlihat "segar" bagi updater.
+
+import os, json, hashlib
+from datetime import datetime, timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+NASA_POWER_BASE_URL = os.environ.get("NASA_POWER_BASE_URL", "https://power.larc.nasa.gov").rstrip("/")
+NASA_TRANSPORT = os.environ.get("NASA_TRANSPORT", "live")
+NASA_FIXTURE_DIR = os.environ.get("NASA_FIXTURE_DIR", os.path.join(BASE_DIR, "nasa_fixtures"))
+
+# Ukuran pool koneksi keep-alive (>= NASA_MAX_WORKERS)
+NASA_POOL_SIZE = int(os.environ.get("NASA_POOL_SIZE", 8))
+
+TRANSPORTS = ("live", "record", "replay")
+DATE_PARAMS = ("start", "end")
+
+def make_session(pool_size=NASA_POOL_SIZE):
+    """Shared keep-alive session; retries are handled by the caller"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+SESSION = make_session()
+
+def endpoint_url(path):
+    return f"{NASA_POWER_BASE_URL}{path}"
+
+class FixtureResponse:
+    """Minimal stand-in for requests.Response served from a fixture"""
+
+    def __init__(self, status_code, payload, headers=None):
+        self.status_code = status_code
+        self.payload = payload
+        self.headers = headers or {}
+
+    def json(self):
+        return self.payload
+
+def fixture_key(url, params):
+    """Stable key for a request, ignoring the date range"""
+    path = url.split("://", 1)[-1].split("/", 1)[-1]
+    stable = {k: str(v) for k, v in params.items() if k not in DATE_PARAMS}
+    digest = hashlib.sha1(json.dumps([path, stable], sort_keys=True).encode()).hexdigest()[:20]
+    return f"{path.rsplit('/', 1)[-1]}-{digest}"
+
+def fixture_path(url, params):
+    return os.path.join(NASA_FIXTURE_DIR, f"{fixture_key(url, params)}.json")
+
+def shift_dates(payload, days):
+    """Shift every YYYYMMDD key of the parameter series by `days`"""
+    if not days:
+        return payload
+
+    def shift_series(parameter):
+        return {
+            f: {
+                (datetime.strptime(d, "%Y%m%d") + timedelta(days=days)).strftime("%Y%m%d"): v
+                for d, v in series.items()
+            }
+            for f, series in parameter.items()
+        }
+
+    payload = dict(payload)
+    if "properties" in payload:
+        props = dict(payload["properties"])
+        props["parameter"] = shift_series(props.get("parameter") or {})
+        payload["properties"] = props
+    if "features" in payload:
+        payload["features"] = [
+            dict(feature, properties=dict(
+                feature["properties"],
+                parameter=shift_series(feature["properties"].get("parameter") or {})
+            ))
+            for feature in payload["features"]
+        ]
+    return payload
+
+def record(url, params, response):
+    if response.status_code != 200:
+        return
+    try:
+        payload = response.json()
+    except ValueError:
+        return
+    os.makedirs(NASA_FIXTURE_DIR, exist_ok=True)
+    path = fixture_path(url, params)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump({
+            "url": url,
+            "params": params,
+            "recorded_at": datetime.utcnow().isoformat() + "Z",
+            "payload": payload
+        }, f)
+    os.replace(tmp, path)
+
+def replay(url, params):
+    try:
+        with open(fixture_path(url, params), "r") as f:
+            fixture = json.load(f)
+    except FileNotFoundError:
+        return FixtureResponse(404, {"messages": [f"No fixture for {fixture_key(url, params)}"]})
+
+    days = 0
+    recorded_end = fixture["params"].get("end")
+    if recorded_end and params.get("end"):
+        days = (datetime.strptime(params["end"], "%Y%m%d") - datetime.strptime(recorded_end, "%Y%m%d")).days
+    return FixtureResponse(200, shift_dates(fixture["payload"], days))
+
+def get(url, params, headers=None, timeout=60, transport=None):
+    """GET a NASA POWER endpoint through the configured transport"""
+    transport = transport or NASA_TRANSPORT
+    if transport == "replay":
+        return replay(url, params)
+    if transport not in TRANSPORTS:
+        raise ValueError(f"Unknown NASA_TRANSPORT {transport!r} (expected one of {TRANSPORTS})")
+
+    response = SESSION.get(url, params=params, headers=headers, timeout=timeout)
+    if transport == "record":
+        record(url, params, response)
+    return response
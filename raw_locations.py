@@ -66,4 +66,13 @@ KECAMATAN = {
     }
 }
 
-print(f"✅ Loaded locations: {len(DEFAULT_LOCATIONS)} default, {len(SULSEL)} Sulsel")
\ No newline at end of file
+# Alias slug/nama (mis. slug lama dari Laravel) -> slug kanonik
+ALIASES = {
+    "pare-pare": "parepare",
+    "kota-parepare": "parepare",
+    "kota-makassar": "makassar",
+    "kota-palopo": "palopo",
+    "sidenreng-rappang": "sidrap",
+    "pangkajene-kepulauan": "pangkep",
+    "pangkajene-dan-kepulauan": "pangkep",
+}
\ No newline at end of file
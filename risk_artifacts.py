@@ -0,0 +1,33 @@
+# risk_artifacts.py - Sisi baca artefak peta risiko (risk_maps/<nama>.npz)
+# Dipisah dari risk_grid (builder) agar worker API yang melayani /risk-map
+# hanya memuat NumPy, bukan seluruh updater (model, cache NASA, log).
+
+import os
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RISK_MAP_DIR = os.environ.get("RISK_MAP_DIR", os.path.join(BASE_DIR, "risk_maps"))
+
+def load_risk_grid(name):
+    """Load an artifact as a dict of arrays"""
+    path = os.path.join(RISK_MAP_DIR, f"{os.path.basename(name)}.npz")
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+def slice_risk_grid(grid, bbox=None):
+    """Restrict a loaded grid to bbox (min_lon, min_lat, max_lon, max_lat)"""
+    lat, lon, probability = grid["lat"], grid["lon"], grid["probability"]
+    if bbox:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        lat_mask = (lat >= min_lat) & (lat <= max_lat)
+        lon_mask = (lon >= min_lon) & (lon <= max_lon)
+        lat, lon = lat[lat_mask], lon[lon_mask]
+        probability = probability[np.ix_(lat_mask, lon_mask)]
+    return lat, lon, probability
+
+def parse_bbox(text):
+    values = [float(v) for v in text.split(",")]
+    if len(values) != 4 or values[0] > values[2] or values[1] > values[3]:
+        raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+    return tuple(values)
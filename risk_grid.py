@@ -0,0 +1,109 @@
+# risk_grid.py - Peta risiko grid (heatmap) untuk satu bounding box
+# Data diambil per region dengan endpoint regional NASA POWER (bukan ribuan
+# request titik), di-sampling ke grid lat/lon teratur, lalu seluruh sel
+# di-score dengan satu panggilan scaler/model. Hasil disimpan sebagai
+# artefak NPZ ringkas di risk_maps/<nama>.npz (dibaca lewat risk_artifacts).
+
+import os, sys, time, argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from nasa_regional import fetch_regional, sample_points
+from risk_artifacts import RISK_MAP_DIR, parse_bbox
+from update_predictions import FEATURES, FETCH_WINDOW_DAYS, NASA_MAX_WORKERS, logger, predict_matrix
+
+# Tanggal peta = tanggal terbaru dengan cakupan sel valid minimal ini
+MIN_COVERAGE = 0.9
+
+# Bounding box (min_lon, min_lat, max_lon, max_lat)
+REGIONS = {
+    "sulsel": (118.8, -7.8, 122.0, -1.8),
+    "jabodetabek": (106.4, -6.8, 107.3, -5.9),
+    "jabar": (106.3, -7.9, 108.9, -5.9),
+}
+
+def feature_matrix(native, lats, lons, date):
+    """(n, len(FEATURES)) matrix of sampled features, NaN where missing"""
+    return np.column_stack([sample_points(native[f], lats, lons, date) for f in FEATURES])
+
+def pick_date(native, lats, lons, min_coverage=MIN_COVERAGE):
+    """Newest date where enough points have all features valid"""
+    dates = sorted({d for f in FEATURES for d in native[f][2]}, reverse=True)
+    for d in dates:
+        matrix = feature_matrix(native, lats, lons, d)
+        coverage = np.isfinite(matrix).all(axis=1).mean() if len(matrix) else 0
+        if coverage >= min_coverage:
+            return d, matrix
+    return None, None
+
+def score_matrix(matrix):
+    """Probabilities for every row; NaN for rows with missing features"""
+    probs = np.full(len(matrix), np.nan)
+    valid = np.isfinite(matrix).all(axis=1)
+    if valid.any():
+        probs[valid] = predict_matrix(matrix[valid])
+    return probs
+
+def build_risk_grid(bbox, resolution, name, date=None):
+    """Fetch, score and write risk_maps/<name>.npz; returns the artifact path"""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    lat_axis = np.round(np.arange(min_lat, max_lat + resolution / 2, resolution), 4)
+    lon_axis = np.round(np.arange(min_lon, max_lon + resolution / 2, resolution), 4)
+    grid_lat, grid_lon = np.meshgrid(lat_axis, lon_axis, indexing="ij")
+
+    end = datetime.utcnow()
+    start = end - timedelta(days=FETCH_WINDOW_DAYS)
+    started = time.time()
+
+    logger.info(f"🗺️ Risk grid {name}: {len(lat_axis)} x {len(lon_axis)} cells at {resolution}°")
+    native = fetch_regional(bbox, start, end, FEATURES, max_workers=NASA_MAX_WORKERS)
+
+    if date:
+        matrix = feature_matrix(native, grid_lat.ravel(), grid_lon.ravel(), date)
+    else:
+        date, matrix = pick_date(native, grid_lat.ravel(), grid_lon.ravel())
+        if date is None:
+            raise RuntimeError("No date with enough valid cells")
+
+    probability = score_matrix(matrix).reshape(grid_lat.shape)
+
+    os.makedirs(RISK_MAP_DIR, exist_ok=True)
+    path = os.path.join(RISK_MAP_DIR, f"{name}.npz")
+    tmp = f"{path}.tmp-{os.getpid()}.npz"
+    np.savez_compressed(
+        tmp,
+        lat=lat_axis.astype(np.float32),
+        lon=lon_axis.astype(np.float32),
+        probability=probability.astype(np.float16),
+        date=np.array(date),
+        bbox=np.array(bbox, dtype=np.float32),
+        resolution=np.array(resolution, dtype=np.float32),
+        created_at=np.array(datetime.utcnow().isoformat() + "Z")
+    )
+    os.replace(tmp, path)
+
+    valid = int(np.isfinite(probability).sum())
+    logger.info(f"✅ Risk grid {name} for {date}: {valid}/{probability.size} cells in {time.time() - started:.1f}s -> {path}")
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a gridded flood-risk map")
+    parser.add_argument("--region", choices=sorted(REGIONS), help="Predefined region")
+    parser.add_argument("--bbox", help="min_lon,min_lat,max_lon,max_lat")
+    parser.add_argument("--resolution", type=float, default=0.1, help="Grid step in degrees")
+    parser.add_argument("--name", help="Artifact name (default: region name)")
+    parser.add_argument("--date", help="YYYYMMDD (default: newest well-covered date)")
+    args = parser.parse_args()
+
+    if not args.region and not args.bbox:
+        parser.error("--region or --bbox is required")
+
+    bbox = parse_bbox(args.bbox) if args.bbox else REGIONS[args.region]
+    name = args.name or args.region or "custom"
+
+    try:
+        print(build_risk_grid(bbox, args.resolution, name, args.date))
+    except Exception as e:
+        logger.error(f"Fatal error: {e}")
+        sys.exit(1)
@@ -0,0 +1,108 @@
+# series_store.py - Deret harian per lokasi (8 fitur NASA) di SQLite
+# Menyimpan hari-hari valid yang sudah di-ingest, sehingga updater cukup
+# meminta tanggal setelah hari terakhir yang tersimpan.
+
+import os, json, sqlite3, threading
+from datetime import datetime, timedelta
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SERIES_PATH = os.environ.get("SERIES_PATH", os.path.join(BASE_DIR, "series.sqlite"))
+SERIES_MAX_DAYS = int(os.environ.get("SERIES_MAX_DAYS", 30))
+
+MISSING = -999
+
+class SeriesStore:
+    """Rolling per-slug series of complete feature days"""
+
+    def __init__(self, features, path=SERIES_PATH, max_days=SERIES_MAX_DAYS):
+        self.features = list(features)
+        self.path = path
+        self.max_days = max_days
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS series (
+                slug TEXT NOT NULL,
+                date TEXT NOT NULL,
+                vals TEXT NOT NULL,
+                PRIMARY KEY (slug, date)
+            )
+        """)
+        self.conn.commit()
+
+    def complete(self, vals):
+        """Return the features as floats, or None if any value is missing / -999"""
+        try:
+            out = {}
+            for f in self.features:
+                value = vals.get(f)
+                if value is None or value == MISSING:
+                    return None
+                out[f] = float(value)
+            return out
+        except (TypeError, ValueError):
+            return None
+
+    def last_dates(self, slugs=None):
+        """Return {slug: last ingested date}"""
+        with self.lock:
+            rows = self.conn.execute("SELECT slug, MAX(date) FROM series GROUP BY slug").fetchall()
+        last = dict(rows)
+        if slugs is None:
+            return last
+        return {slug: last.get(slug) for slug in slugs}
+
+    @staticmethod
+    def next_start(last_date, default_start):
+        """First date to request: the day after last_date, never before default_start"""
+        if not last_date:
+            return default_start
+        start = datetime.strptime(last_date, "%Y%m%d") + timedelta(days=1)
+        return max(start, default_start)
+
+    def ingest(self, slug, rows):
+        """Store the complete days of {date: {feature: value}}; returns how many were new"""
+        clean = {}
+        for date, vals in (rows or {}).items():
+            vals = self.complete(vals)
+            if vals:
+                clean[date] = vals
+
+        if not clean:
+            return 0
+
+        with self.lock:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO series VALUES (?, ?, ?)",
+                [(slug, date, json.dumps(vals)) for date, vals in clean.items()]
+            )
+            added = self.conn.total_changes - before
+
+            # Rolling window: buang hari yang lebih lama dari max_days
+            self.conn.execute(
+                "DELETE FROM series WHERE slug=? AND date NOT IN "
+                "(SELECT date FROM series WHERE slug=? ORDER BY date DESC LIMIT ?)",
+                (slug, slug, self.max_days)
+            )
+            self.conn.commit()
+        return added
+
+    def rows(self, slug, days=None):
+        """Return {date: {feature: value}} for slug, newest `days` days (all if None)"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT date, vals FROM series WHERE slug=? ORDER BY date DESC LIMIT ?",
+                (slug, days or self.max_days)
+            ).fetchall()
+        return {date: json.loads(vals) for date, vals in reversed(rows)}
+
+def open_store(features):
+    """Open the configured series store, or None when unavailable"""
+    try:
+        return SeriesStore(features)
+    except Exception as e:
+        print(f"⚠️ Series store disabled: {e}")
+        return None
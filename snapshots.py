@@ -0,0 +1,112 @@
+# snapshots.py - Publikasi prediksi per generasi (atomic)
+# Setiap update ditulis sebagai satu file packed snapshots/predictions-<gen>.json,
+# lalu pointer snapshots/CURRENT diganti dengan os.replace. Pembaca selalu
+# memuat satu generasi utuh; N generasi terakhir disimpan untuk rollback.
+
+import os, json, sys
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", os.path.join(BASE_DIR, "snapshots"))
+SNAPSHOT_KEEP = int(os.environ.get("SNAPSHOT_KEEP", 5))
+CURRENT_FILE = os.path.join(SNAPSHOT_DIR, "CURRENT")
+
+PREFIX = "predictions-"
+
+def snapshot_path(generation):
+    return os.path.join(SNAPSHOT_DIR, f"{PREFIX}{generation}.json")
+
+def write_atomic(path, text):
+    """Write text to path via a temp file + fsync + os.replace"""
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def list_generations():
+    """Published generations, oldest first"""
+    try:
+        names = os.listdir(SNAPSHOT_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(
+        name[len(PREFIX):-len(".json")]
+        for name in names
+        if name.startswith(PREFIX) and name.endswith(".json")
+    )
+
+def current_generation():
+    try:
+        with open(CURRENT_FILE, "r") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def load(generation=None):
+    """Return (generation, {slug: prediction}) for the given or current generation"""
+    generation = generation or current_generation()
+    if not generation:
+        return None, {}
+    with open(snapshot_path(generation), "r", encoding="utf-8") as f:
+        packed = json.load(f)
+    return generation, packed.get("predictions", {})
+
+def switch(generation):
+    """Atomically point CURRENT at an existing generation"""
+    if not os.path.exists(snapshot_path(generation)):
+        raise FileNotFoundError(f"Unknown generation: {generation}")
+    write_atomic(CURRENT_FILE, generation)
+
+def prune(keep=SNAPSHOT_KEEP):
+    """Delete all but the newest `keep` generations (never the current one)"""
+    current = current_generation()
+    generations = list_generations()
+    for generation in generations[:max(0, len(generations) - keep)]:
+        if generation != current:
+            try:
+                os.remove(snapshot_path(generation))
+            except OSError:
+                pass
+
+def publish(predictions, keep=SNAPSHOT_KEEP):
+    """Write a new packed generation and switch CURRENT to it"""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    generation = datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+    packed = {
+        "generation": generation,
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "count": len(predictions),
+        "predictions": predictions
+    }
+    write_atomic(snapshot_path(generation), json.dumps(packed, ensure_ascii=False))
+    switch(generation)
+    prune(keep)
+    return generation
+
+def rollback(steps=1):
+    """Switch CURRENT back `steps` generations; returns the new current generation"""
+    generations = list_generations()
+    current = current_generation()
+    if current not in generations:
+        raise RuntimeError("No current generation to roll back from")
+    index = generations.index(current) - steps
+    if index < 0:
+        raise RuntimeError(f"Only {generations.index(current)} older generations available")
+    switch(generations[index])
+    return generations[index]
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if command == "list":
+        current = current_generation()
+        for generation in list_generations():
+            print(f"{'*' if generation == current else ' '} {generation}")
+    elif command == "rollback":
+        steps = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+        print(f"↩️ Current generation: {rollback(steps)}")
+    else:
+        print("Usage: python snapshots.py [list | rollback [steps]]")
+        sys.exit(1)
@@ -0,0 +1,73 @@
+# spatial_index.py - Indeks spasial lokasi (array koordinat + haversine vektor)
+# Dibangun sekali dari LOCATION_INDEX; query terdekat dan bounding box
+# berjalan sebagai satu operasi NumPy atas seluruh katalog.
+
+import threading
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+class SpatialIndex:
+    """Coordinate arrays over the location catalog"""
+
+    def __init__(self, index):
+        if hasattr(index, "coordinates"):
+            # CompactCatalog: kolom koordinat sudah berupa array
+            slugs, lat, lon = index.coordinates()
+            self.slugs = list(slugs)
+            self.lat = np.array(lat, dtype=float)
+            self.lon = np.array(lon, dtype=float)
+        else:
+            self.slugs = list(index.keys())
+            self.lat = np.array([index[s]["lat"] for s in self.slugs], dtype=float)
+            self.lon = np.array([index[s]["lon"] for s in self.slugs], dtype=float)
+        self.lat_rad = np.radians(self.lat)
+        self.lon_rad = np.radians(self.lon)
+        self.cos_lat = np.cos(self.lat_rad)
+
+    def distances_km(self, lat, lon):
+        """Haversine distance from (lat, lon) to every location"""
+        lat_rad = np.radians(lat)
+        dlat = self.lat_rad - lat_rad
+        dlon = self.lon_rad - np.radians(lon)
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat_rad) * self.cos_lat * np.sin(dlon / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    def nearest(self, lat, lon, k=5):
+        """Return [(slug, distance_km)] of the k closest locations"""
+        if not self.slugs:
+            return []
+        k = min(k, len(self.slugs))
+        distances = self.distances_km(lat, lon)
+        if k < len(self.slugs):
+            idx = np.argpartition(distances, k - 1)[:k]
+        else:
+            idx = np.arange(len(self.slugs))
+        idx = idx[np.argsort(distances[idx])]
+        return [(self.slugs[i], float(distances[i])) for i in idx]
+
+    def within(self, min_lon, min_lat, max_lon, max_lat):
+        """Return slugs inside the bounding box (edges inclusive)"""
+        mask = (self.lat >= min_lat) & (self.lat <= max_lat)
+        if min_lon <= max_lon:
+            mask &= (self.lon >= min_lon) & (self.lon <= max_lon)
+        else:
+            # Bounding box melintasi antimeridian
+            mask &= (self.lon >= min_lon) | (self.lon <= max_lon)
+        return [self.slugs[i] for i in np.flatnonzero(mask)]
+
+_INDEX = None
+_INDEX_KEY = None
+_INDEX_LOCK = threading.Lock()
+
+def get_spatial_index(index):
+    """Shared index, rebuilt only when the catalog changes"""
+    global _INDEX, _INDEX_KEY
+    key = (id(index), len(index))
+    if _INDEX is None or _INDEX_KEY != key:
+        with _INDEX_LOCK:
+            if _INDEX is None or _INDEX_KEY != key:
+                _INDEX = SpatialIndex(index)
+                _INDEX_KEY = key
+    return _INDEX
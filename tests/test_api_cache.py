@@ -0,0 +1,66 @@
+# test_api_cache.py - Cache respons /predict per generasi snapshot: body
+# yang disimpan harus berasal dari generasi yang sama dengan kunci/ETag-nya,
+# juga saat snapshot berganti di tengah request.
+#
+#   python -m pytest -q
+
+import pytest
+
+import snapshots
+
+SLUG = "parepare"
+
+def prediction(date):
+    return {"location": "Parepare", "date": date, "rain_mm": 1.5}
+
+@pytest.fixture(scope="module")
+def api_module():
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("AUTO_UPDATE_ENABLED", "0")
+        import api
+    return api
+
+@pytest.fixture
+def api(api_module, monkeypatch, tmp_path):
+    """api with an empty snapshot dir, no pointer-check throttle and no cached responses"""
+    snapshot_dir = tmp_path / "snapshots"
+    monkeypatch.setattr(snapshots, "SNAPSHOT_DIR", str(snapshot_dir))
+    monkeypatch.setattr(snapshots, "CURRENT_FILE", str(snapshot_dir / "CURRENT"))
+    monkeypatch.setattr(api_module, "CACHE_CHECK_SECONDS", 0)
+    monkeypatch.setattr(api_module, "PREDICTIONS", api_module.PredictionCache(str(tmp_path / "predictions")))
+    monkeypatch.setattr(api_module, "RESPONSES", {})
+    return api_module
+
+def test_new_generation_rebuilds_cached_response(api):
+    client = api.app.test_client()
+    snapshots.publish({SLUG: prediction("20261001")})
+    first = client.get(f"/predict/{SLUG}")
+    assert first.get_json()["date"] == "20261001"
+
+    snapshots.publish({SLUG: prediction("20261002")})
+    second = client.get(f"/predict/{SLUG}", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert second.get_json()["date"] == "20261002"
+
+def test_snapshot_swap_between_lookup_and_caching(api, monkeypatch):
+    client = api.app.test_client()
+    snapshots.publish({SLUG: prediction("20261001")})
+    lookup = api.PREDICTIONS.get
+    swapped = []
+
+    def get_then_publish(slug):
+        data = lookup(slug)
+        if data and not swapped:
+            swapped.append(snapshots.publish({SLUG: prediction("20261002")}))
+        return data
+
+    monkeypatch.setattr(api.PREDICTIONS, "get", get_then_publish)
+    first = client.get(f"/predict/{SLUG}")
+    assert swapped
+    assert first.get_json()["date"] == "20261002"
+
+    # ETag generasi baru harus menunjuk body generasi baru
+    second = client.get(f"/predict/{SLUG}", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 304
+    entry = api.RESPONSES[("predict", SLUG)]
+    assert entry["generation"] == api.PREDICTIONS.marker
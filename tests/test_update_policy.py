@@ -0,0 +1,199 @@
+# test_update_policy.py - Logika keputusan updater: circuit breaker NASA,
+# Retry-After, dan pembagian lokasi mode selective. Request NASA diarahkan
+# ke nasa_stub lokal, tanpa jaringan.
+#
+#   python -m pytest -q
+
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+import nasa_client
+import nasa_stub
+import nasa_transport
+
+POINT_PATH = "/api/temporal/daily/point"
+
+def point_params():
+    return {
+        "parameters": "PRECTOTCORR",
+        "community": "AG",
+        "latitude": -4.0096,
+        "longitude": 119.6236,
+        "start": "20260101",
+        "end": "20260103",
+        "format": "JSON"
+    }
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**options):
+        server, base_url = nasa_stub.start_stub(latency_ms=0, **options)
+        servers.append(server)
+        return server, base_url + POINT_PATH
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+@pytest.fixture
+def client(monkeypatch):
+    """Fresh run-wide client state: no rate limit, small circuit threshold"""
+    monkeypatch.setattr(nasa_client, "RATE_LIMITER", nasa_client.RateLimiter(0))
+    monkeypatch.setattr(nasa_client, "RETRY_BUDGET", nasa_client.RetryBudget(retries=10))
+    monkeypatch.setattr(nasa_client, "CIRCUIT", nasa_client.CircuitBreaker(threshold=2, cooldown=60))
+    monkeypatch.setattr(nasa_client, "backoff_delay", lambda attempt: 0)
+    return nasa_client
+
+class Headers:
+    def __init__(self, headers):
+        self.headers = headers
+
+# === Circuit breaker ===
+
+def test_circuit_opens_after_threshold_and_probes_after_cooldown():
+    circuit = nasa_client.CircuitBreaker(threshold=3, cooldown=0.2)
+    for _ in range(2):
+        circuit.record_failure()
+    assert circuit.allow()
+
+    circuit.record_failure()
+    assert not circuit.allow()
+
+    time.sleep(0.25)
+    assert circuit.allow()       # satu probe per cooldown
+    assert not circuit.allow()
+
+    circuit.record_success()
+    assert circuit.allow()
+    assert circuit.failures == 0
+
+def test_success_resets_consecutive_failures():
+    circuit = nasa_client.CircuitBreaker(threshold=2, cooldown=60)
+    circuit.record_failure()
+    circuit.record_success()
+    circuit.record_failure()
+    assert circuit.allow()
+
+def test_request_json_stops_calling_nasa_once_circuit_opens(stub, client):
+    server, url = stub(rate_429=1.0, retry_after=0)
+    assert client.request_json(url, point_params(), "point", retry=5) is None
+    # Dua 429 membuka circuit; attempt berikutnya tidak mengirim request
+    assert server.RequestHandlerClass.config.counts["requests"] == 2
+    assert client.request_json(url, point_params(), "point", retry=5) is None
+    assert server.RequestHandlerClass.config.counts["requests"] == 2
+
+def test_request_json_closes_circuit_on_success(stub, client):
+    _, url = stub()
+    client.CIRCUIT.record_failure()
+    payload = client.request_json(url, point_params(), "point")
+    assert payload["properties"]["parameter"]["PRECTOTCORR"]
+    assert client.CIRCUIT.failures == 0
+
+# === Retry-After ===
+
+def test_retry_after_seconds_from_stub_429(stub):
+    _, url = stub(rate_429=1.0, retry_after=3)
+    response = nasa_transport.get(url, point_params(), transport="live")
+    assert response.status_code == 429
+    assert nasa_client.retry_after_seconds(response) == 3
+
+def test_retry_after_seconds_is_capped(monkeypatch):
+    monkeypatch.setattr(nasa_client, "NASA_BACKOFF_MAX_SECONDS", 30)
+    assert nasa_client.retry_after_seconds(Headers({"Retry-After": "999"})) == 30
+
+def test_retry_after_http_date():
+    when = datetime.now(timezone.utc) + timedelta(seconds=10)
+    seconds = nasa_client.retry_after_seconds(Headers({"Retry-After": format_datetime(when, usegmt=True)}))
+    assert 8 <= seconds <= 10
+
+def test_retry_after_http_date_in_the_past_is_zero():
+    when = datetime.now(timezone.utc) - timedelta(minutes=5)
+    assert nasa_client.retry_after_seconds(Headers({"Retry-After": format_datetime(when, usegmt=True)})) == 0
+
+def test_retry_after_missing_or_invalid_falls_back_to_backoff(monkeypatch):
+    monkeypatch.setattr(nasa_client, "backoff_delay", lambda attempt: 1.5)
+    assert nasa_client.retry_after_seconds(Headers({})) == 1.5
+    assert nasa_client.retry_after_seconds(Headers({"Retry-After": "soon"})) == 1.5
+
+# === Selective update ===
+
+NOW = datetime(2026, 10, 17, 12, 0)
+
+@pytest.fixture(scope="module")
+def updater(tmp_path_factory):
+    """update_predictions with all state in a temp dir and NASA served by the stub"""
+    state = tmp_path_factory.mktemp("updater")
+    server, base_url = nasa_stub.start_stub(latency_ms=0)
+    with pytest.MonkeyPatch.context() as mp:
+        for name, path in {
+            "NASA_CACHE_PATH": "nasa_cache.sqlite",
+            "SERIES_PATH": "series.sqlite",
+            "SNAPSHOT_DIR": "snapshots",
+            "HISTORY_PATH": "history.sqlite",
+            "PREDICTIONS_DIR": "predictions",
+            "UPDATE_SUMMARY_FILE": "update_summary.json",
+            "UPDATE_LOG_FILE": "update.log",
+        }.items():
+            mp.setenv(name, str(state / path))
+        mp.setattr(nasa_client, "RATE_LIMITER", nasa_client.RateLimiter(0))
+        import update_predictions
+        mp.setattr(update_predictions, "NASA_URL", base_url + POINT_PATH)
+        yield update_predictions
+    server.shutdown()
+
+def published(date, hours_ago):
+    return {"date": date, "updated_at": (NOW - timedelta(hours=hours_ago)).isoformat() + "Z"}
+
+def test_plan_selective_splits_forced_fresh_and_probes(updater, monkeypatch):
+    monkeypatch.setattr(updater, "UPDATE_PROBE_LOCATIONS", 2)
+    monkeypatch.setattr(updater, "UPDATE_MAX_AGE_HOURS", 24)
+    loc = {"name": "x", "group": "g", "parent": "p", "lat": 0.0, "lon": 0.0}
+    index = {slug: dict(loc, slug=slug) for slug in (
+        "fresh", "behind", "old-result", "never", "bad-timestamp", "parepare", "stalest"
+    )}
+    previous = {
+        "fresh": published("20261016", 1),          # sudah di tanggal terbaru yang mungkin
+        "behind": published("20261014", 1),
+        "old-result": published("20261016", 30),    # lebih tua dari UPDATE_MAX_AGE_HOURS
+        "bad-timestamp": {"date": "20261014", "updated_at": "not a time"},
+        "parepare": published("20261015", 1),       # lokasi Laravel
+        "stalest": published("20261010", 1),
+    }
+
+    plan = updater.plan_selective(index, previous, now=NOW)
+
+    assert plan["fresh"] == 1
+    assert plan["forced"] == {"old-result", "never", "bad-timestamp"}
+    # Probe: bukan forced, Laravel dulu, lalu yang paling tertinggal
+    assert [slug for slug, _ in plan["probe"]] == ["parepare", "stalest"]
+    rest = {slug for slug, _ in plan["rest"]}
+    assert rest == {"behind", "old-result", "never", "bad-timestamp"}
+    assert "fresh" not in rest
+
+def test_plan_selective_without_probes(updater, monkeypatch):
+    monkeypatch.setattr(updater, "UPDATE_PROBE_LOCATIONS", 0)
+    index = {"a": {"name": "a"}, "b": {"name": "b"}}
+    plan = updater.plan_selective(index, {"a": published("20261014", 1)}, now=NOW)
+    assert plan["probe"] == []
+    assert {slug for slug, _ in plan["rest"]} == {"a", "b"}
+    assert plan["forced"] == {"b"}
+
+def test_selective_run_carries_everything_over_when_nasa_has_nothing_new(updater):
+    first = updater.main(mode="full")
+    assert first["status"] == "success"
+    assert first["success"] == len(updater.LOCATION_INDEX)
+
+    second = updater.main(mode="selective")
+    assert second["status"] == "unchanged"
+    assert second["probe_advanced"] is False
+    assert second["success"] == 0
+    assert second["carried_over"] == len(updater.LOCATION_INDEX)
+    assert second["generation"] == first["generation"]
+    progress = updater.get_progress()
+    assert progress["state"] == "done"
+    assert progress["processed"] == progress["total"]
@@ -1,185 +1,441 @@
-import os, json, time, requests
-import pandas as pd
-import joblib
+import os, json, time
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
 import logging
+import math
 import sys
-
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('update.log')
-    ]
-)
-logger = logging.getLogger(__name__)
+import threading
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-OUT_DIR = os.path.join(BASE_DIR, "predictions")
+OUT_DIR = os.environ.get("PREDICTIONS_DIR", os.path.join(BASE_DIR, "predictions"))
+SUMMARY_FILE = os.environ.get("UPDATE_SUMMARY_FILE", os.path.join(BASE_DIR, "update_summary.json"))
 os.makedirs(OUT_DIR, exist_ok=True)
 
-# Load model and scaler
-try:
-    scaler = joblib.load("scaler.pkl")
-    model = joblib.load("logreg_model.pkl")
-    logger.info("✅ Model and scaler loaded successfully")
-except Exception as e:
-    logger.error(f"❌ Failed to load model/scaler: {e}")
-    sys.exit(1)
+LOG_FILE = os.environ.get("UPDATE_LOG_FILE", os.path.join(BASE_DIR, "update.log"))
+
+# Setup logging (logger modul saja, supaya aman di-import oleh api.py)
+logger = logging.getLogger("update_predictions")
+if not logger.handlers:
+    _formatter = logging.Formatter('%(asctime)s - %(name)s - %(threadName)s - %(levelname)s - %(message)s')
+    for _handler in (logging.StreamHandler(sys.stdout), logging.FileHandler(LOG_FILE)):
+        _handler.setFormatter(_formatter)
+        logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+# Model and scaler stay loaded for the lifetime of the process
+scaler = None
+model = None
+MODEL_LOCK = threading.Lock()
+
+def load_model():
+    """Load model and scaler once per process"""
+    global scaler, model
+    with MODEL_LOCK:
+        if model is None:
+            # Import berat (joblib/sklearn) ditunda sampai model benar-benar dipakai
+            import joblib
+            scaler = joblib.load(os.path.join(BASE_DIR, "scaler.pkl"))
+            model = joblib.load(os.path.join(BASE_DIR, "logreg_model.pkl"))
+            logger.info("✅ Model and scaler loaded successfully")
+    return scaler, model
+
+# Progress of the running update, read by api.py for /update-status
+PROGRESS = {"state": "idle"}
+PROGRESS_LOCK = threading.Lock()
+RUN_LOCK = threading.Lock()
+
+def set_progress(**fields):
+    with PROGRESS_LOCK:
+        PROGRESS.update(fields)
+
+def get_progress():
+    """Snapshot of the current (or last) update's progress"""
+    with PROGRESS_LOCK:
+        return dict(PROGRESS)
 
 FEATURES = [
     "PRECTOTCORR", "T2M_MIN", "T2M_MAX", "RH2M",
     "WS2M", "WD2M", "PS", "ALLSKY_SFC_SW_DWN"
 ]
 
-NASA_URL = "https://power.larc.nasa.gov/api/temporal/daily/point"
+import nasa_transport
+
+NASA_URL = nasa_transport.endpoint_url("/api/temporal/daily/point")
+
+# Jendela hari yang diminta saat lokasi belum punya deret tersimpan
+FETCH_WINDOW_DAYS = 10
+# Jumlah hari terbaru yang di-score dan disimpan sebagai deret harian
+DAILY_SERIES_DAYS = int(os.environ.get("DAILY_SERIES_DAYS", 7))
+
+# Grid NASA POWER: (lat_step, lon_step, lat_edge, lon_edge) dalam derajat.
+# Meteorologi MERRA-2 0.5 x 0.625 (sel berpusat di kelipatan step) dan
+# radiasi matahari 1 x 1 (sel dibatasi derajat bulat). Lokasi hanya berbagi
+# satu request bila berada di sel yang sama untuk semua grid.
+POWER_GRIDS = (
+    (0.5, 0.625, 0.25, 0.3125),
+    (1.0, 1.0, 0.0, 0.0),
+)
+
+# Concurrency: jumlah request NASA yang boleh berjalan bersamaan (batas
+# laju per detik ada di nasa_client.NASA_RATE_PER_SECOND).
+NASA_MAX_WORKERS = int(os.environ.get("NASA_MAX_WORKERS", 4))
+# Mode fetch: "point" (satu request per sel grid) atau "regional" (lokasi
+# yang berdekatan diambil sekaligus lewat endpoint regional, lihat nasa_regional)
+NASA_FETCH_MODE = os.environ.get("NASA_FETCH_MODE", "point")
+NASA_REGION_SPAN_DEGREES = float(os.environ.get("NASA_REGION_SPAN_DEGREES", 8))
+# Minimal sel per region; 0 = otomatis (lebih banyak dari request regional per region)
+NASA_REGION_MIN_CELLS = int(os.environ.get("NASA_REGION_MIN_CELLS", 0))
+
+# Mode update: "selective" (hanya lokasi yang datanya bisa bertambah) atau "full"
+UPDATE_MODE = os.environ.get("UPDATE_MODE", "selective")
+# Prediksi yang lebih tua dari ini selalu diproses ulang (mode selective)
+UPDATE_MAX_AGE_HOURS = float(os.environ.get("UPDATE_MAX_AGE_HOURS", 24))
+# Jumlah lokasi yang diambil dulu untuk mengecek apakah NASA punya tanggal baru
+UPDATE_PROBE_LOCATIONS = int(os.environ.get("UPDATE_PROBE_LOCATIONS", 2))
+
+from locations import LOCATION_INDEX, LARAVEL_LOCATIONS
+from nasa_cache import open_cache
+from series_store import SeriesStore, open_store
+import snapshots
+import history
+import metrics
+from nasa_client import (
+    CIRCUIT, NASA_CIRCUIT_OPENS, NASA_RATE_LIMITED, NASA_RATE_PER_SECOND, NASA_REQUEST_SECONDS,
+    NASA_RETRIES, NASA_RETRY_BUDGET, RETRY_BUDGET, request_json
+)
 
-from locations import LOCATION_INDEX
+NASA_CACHE = open_cache()
+SERIES_STORE = open_store(FEATURES)
+
+# Metrik cache NASA dan fase update (dirender di /metrics, dirangkum per update)
+NASA_CACHE_DAYS = metrics.counter(
+    "tulip_nasa_cache_days_total", "Location-days found in (hit) or missing from (miss) the NASA cache", ("result",)
+)
+UPDATE_PHASE_SECONDS = metrics.histogram(
+    "tulip_update_phase_seconds", "Duration of each update phase", ("phase",), metrics.PHASE_BUCKETS
+)
+UPDATE_RUNS = metrics.counter("tulip_update_runs_total", "Completed update runs", ("status",))
+
+def nasa_stats():
+    """Cumulative NASA counters; run_update diffs two readings for its summary"""
+    latency, requests_made = NASA_REQUEST_SECONDS.totals()
+    return {
+        "requests": requests_made,
+        "latency_seconds": latency,
+        "retries": NASA_RETRIES.total(),
+        "rate_limited": NASA_RATE_LIMITED.total(),
+        "circuit_opens": NASA_CIRCUIT_OPENS.total(),
+        "cache_hit_days": NASA_CACHE_DAYS.value(result="hit"),
+        "cache_miss_days": NASA_CACHE_DAYS.value(result="miss")
+    }
 
 def slugify(name):
     """Simple slugify function"""
     return name.lower().replace(" ", "-")
 
-def fetch_valid(lat, lon, retry=3):
-    """Fetch NASA data with retry mechanism"""
-    end = datetime.utcnow()
-    start = end - timedelta(days=10)
+def request_power(lat, lon, start, end, retry=3):
+    """Request NASA POWER daily data for one point
+    
+    Returns {date: {feature: value}} or None when every attempt failed.
+    """
+    params = {
+        "parameters": ",".join(FEATURES),
+        "community": "AG",
+        "latitude": lat,
+        "longitude": lon,
+        "start": start.strftime("%Y%m%d"),
+        "end": end.strftime("%Y%m%d"),
+        "format": "JSON"
+    }
+    logger.info(f"🌍 Fetching NASA data {params['start']}..{params['end']}")
+    
+    def validate(r):
+        if "properties" not in r or "parameter" not in r["properties"]:
+            return "No parameters in NASA response"
+        if not r["properties"]["parameter"] or FEATURES[0] not in r["properties"]["parameter"]:
+            return f"No {FEATURES[0]} data in response"
+        return None
     
-    for attempt in range(retry):
+    r = request_json(NASA_URL, params, "point", retry=retry, validate=validate)
+    if r is None:
+        return None
+    
+    params_data = r["properties"]["parameter"]
+    return {
+        d: {f: params_data.get(f, {}).get(d) for f in FEATURES}
+        for d in params_data[FEATURES[0]]
+    }
+
+def latest_valid(rows):
+    """Pick the newest date whose eight features are all present (not -999)"""
+    available_dates = list(rows.keys())
+    logger.info(f"📅 Available dates: {len(available_dates)} total")
+    
+    if not available_dates:
+        logger.warning("⚠️ No dates available")
+        return None, None
+    
+    # Log 3 tanggal terbaru
+    latest_dates = sorted(available_dates, reverse=True)[:3]
+    logger.info(f"📆 Latest dates: {latest_dates}")
+    
+    # Cari data terbaru yang valid
+    for d in sorted(available_dates, reverse=True):
         try:
-            params = {
-                "parameters": ",".join(FEATURES),
-                "community": "AG",
-                "latitude": lat,
-                "longitude": lon,
-                "start": start.strftime("%Y%m%d"),
-                "end": end.strftime("%Y%m%d"),
-                "format": "JSON"
-            }
-            
-            logger.info(f"🌍 Fetching NASA data - attempt {attempt+1}")
-            
-            headers = {
-                "User-Agent": "TULIP-SC/1.0",
-                "Accept": "application/json"
-            }
+            vals = {}
+            valid = True
             
-            response = requests.get(
-                NASA_URL,
-                params=params,
-                headers=headers,
-                timeout=60
-            )
+            for f in FEATURES:
+                value = rows[d].get(f)
+                if value is None or value == -999:
+                    valid = False
+                    break
+                vals[f] = float(value)
             
-            if response.status_code != 200:
-                logger.error(f"❌ NASA API error {response.status_code}")
-                if response.status_code == 429:
-                    logger.warning("⚠️ Rate limited, waiting...")
-                    time.sleep(30)
-                continue
+            if valid:
+                data_date = datetime.strptime(d, "%Y%m%d")
+                days_ago = (datetime.utcnow() - data_date).days
                 
-            r = response.json()
-            
-            if "properties" not in r or "parameter" not in r["properties"]:
-                logger.warning("⚠️ No parameters in NASA response")
-                continue
+                logger.info(f"📊 Data {d}: {days_ago} days ago")
                 
-            params_data = r["properties"]["parameter"]
-            
-            if not params_data or FEATURES[0] not in params_data:
-                logger.warning(f"⚠️ No {FEATURES[0]} data in response")
-                continue
-            
-            available_dates = list(params_data[FEATURES[0]].keys())
-            logger.info(f"📅 Available dates: {len(available_dates)} total")
-            
-            if not available_dates:
-                logger.warning("⚠️ No dates available")
-                return None, None
-            
-            # Log 3 tanggal terbaru
-            latest_dates = sorted(available_dates, reverse=True)[:3]
-            logger.info(f"📆 Latest dates: {latest_dates}")
-            
-            # Cari data terbaru yang valid
-            for d in sorted(available_dates, reverse=True):
-                try:
-                    vals = {}
-                    valid = True
-                    
-                    for f in FEATURES:
-                        value = params_data[f].get(d)
-                        if value is None or value == -999:
-                            valid = False
-                            break
-                        vals[f] = float(value)
+                if days_ago <= 7:
+                    logger.info(f"✅ Valid data for {d} ({days_ago} days ago)")
+                    return d, vals
+                else:
+                    logger.warning(f"⚠️ Data old: {d} ({days_ago} days ago)")
+                    return d, vals
                     
-                    if valid:
-                        data_date = datetime.strptime(d, "%Y%m%d")
-                        days_ago = (datetime.utcnow() - data_date).days
-                        
-                        logger.info(f"📊 Data {d}: {days_ago} days ago")
-                        
-                        if days_ago <= 7:
-                            logger.info(f"✅ Valid data for {d} ({days_ago} days ago)")
-                            return d, vals
-                        else:
-                            logger.warning(f"⚠️ Data old: {d} ({days_ago} days ago)")
-                            return d, vals
-                            
-                except (KeyError, ValueError, TypeError) as e:
-                    logger.debug(f"Skip date {d}: {e}")
-                    continue
-            
-            logger.warning(f"⚠️ No valid data in {len(available_dates)} dates")
-            return None, None
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"🌐 Request failed (attempt {attempt+1}): {e}")
-            if attempt < retry - 1:
-                wait = 15 * (attempt + 1)
-                logger.info(f"⏳ Waiting {wait}s before retry...")
-                time.sleep(wait)
-        except Exception as e:
-            logger.error(f"🔥 Unexpected error: {e}")
-            if attempt < retry - 1:
-                time.sleep(10)
+        except (KeyError, ValueError, TypeError) as e:
+            logger.debug(f"Skip date {d}: {e}")
+            continue
     
-    logger.error(f"❌ All {retry} attempts failed")
+    logger.warning(f"⚠️ No valid data in {len(available_dates)} dates")
     return None, None
 
-def fetch_valid_with_fallback(lat, lon, location_name, slug):
-    """Fetch NASA data with fallback to existing data"""
-    date, data = fetch_valid(lat, lon)
+def window_dates(start=None):
+    """YYYYMMDD strings from start (default: FETCH_WINDOW_DAYS ago) until today"""
+    end = datetime.utcnow()
+    if start is None:
+        start = end - timedelta(days=FETCH_WINDOW_DAYS)
+    return [
+        (start + timedelta(days=i)).strftime("%Y%m%d")
+        for i in range((end.date() - start.date()).days + 1)
+    ]
+
+def fetch_rows(lat, lon, start=None, retry=3):
+    """Fetch {date: {feature: value}} from start until today, reusing cached days
+    
+    Returns None when nothing could be fetched or read from the cache.
+    """
+    dates = window_dates(start)
+    if not dates:
+        return {}
     
-    if not data:
-        logger.warning(f"⚠️ No new NASA data for {location_name}")
+    rows = NASA_CACHE.get_many(lat, lon, FEATURES, dates) if NASA_CACHE else {}
+    missing = [d for d in dates if d not in rows]
+    NASA_CACHE_DAYS.inc(len(dates) - len(missing), result="hit")
+    NASA_CACHE_DAYS.inc(len(missing), result="miss")
+    
+    if missing:
+        logger.info(f"💾 Cache: {len(rows)} days cached, fetching {len(missing)} missing")
+        fetched = request_power(
+            lat, lon,
+            datetime.strptime(missing[0], "%Y%m%d"),
+            datetime.strptime(missing[-1], "%Y%m%d"),
+            retry
+        )
         
-        existing_file = os.path.join(OUT_DIR, f"{slug}.json")
-        if os.path.exists(existing_file):
-            try:
-                with open(existing_file, "r") as f:
-                    existing = json.load(f)
-                    existing_date = existing.get("date")
-                    existing_data = existing.get("nasa")
+        if fetched is None and not rows:
+            return None
+        
+        if fetched:
+            if NASA_CACHE:
+                NASA_CACHE.put_many(lat, lon, FEATURES, fetched)
+            rows.update(fetched)
+    else:
+        logger.info(f"💾 Cache: all {len(dates)} days cached")
+    
+    return rows
+
+def valid_window(rows, days=FETCH_WINDOW_DAYS):
+    """Every day of rows within the last `days` days whose features are all valid"""
+    cutoff = (datetime.utcnow() - timedelta(days=days)).strftime("%Y%m%d")
+    window = {}
+    for d, vals in rows.items():
+        if d < cutoff:
+            continue
+        try:
+            if all(vals.get(f) is not None and vals.get(f) != -999 for f in FEATURES):
+                window[d] = {f: float(vals[f]) for f in FEATURES}
+        except (TypeError, ValueError):
+            continue
+    return window
+
+def load_existing(location_name, slug):
+    """Load the last published NASA data for a location"""
+    logger.warning(f"⚠️ No new NASA data for {location_name}")
+    
+    existing_file = os.path.join(OUT_DIR, f"{slug}.json")
+    if os.path.exists(existing_file):
+        try:
+            with open(existing_file, "r") as f:
+                existing = json.load(f)
+                existing_date = existing.get("date")
+                existing_data = existing.get("nasa")
+                
+                if existing_date and existing_data:
+                    try:
+                        existing_dt = datetime.strptime(existing_date, "%Y%m%d")
+                        days_old = (datetime.utcnow() - existing_dt).days
+                        logger.info(f"↩️ Using existing data ({days_old} days old)")
+                    except:
+                        logger.info(f"↩️ Using existing data")
                     
-                    if existing_date and existing_data:
-                        try:
-                            existing_dt = datetime.strptime(existing_date, "%Y%m%d")
-                            days_old = (datetime.utcnow() - existing_dt).days
-                            logger.info(f"↩️ Using existing data ({days_old} days old)")
-                        except:
-                            logger.info(f"↩️ Using existing data")
-                        
-                        return existing_date, existing_data
-            except Exception as e:
-                logger.error(f"Error loading existing data: {e}")
+                    return existing_date, existing_data
+        except Exception as e:
+            logger.error(f"Error loading existing data: {e}")
+    
+    return None, None
+
+def grid_cell(lat, lon):
+    """Return the POWER grid cell key of a coordinate (one index pair per grid)"""
+    return tuple(
+        (math.floor((lat - lat_edge) / lat_step), math.floor((lon - lon_edge) / lon_step))
+        for lat_step, lon_step, lat_edge, lon_edge in POWER_GRIDS
+    )
+
+def plan_fetches(items):
+    """Group (slug, loc) pairs into one fetch per POWER grid cell
+    
+    Each planned fetch uses the coordinates of its first member, which lie
+    inside every grid cell the group shares.
+    """
+    plan = {}
+    for slug, loc in items:
+        key = grid_cell(loc["lat"], loc["lon"])
+        if key not in plan:
+            plan[key] = {"lat": loc["lat"], "lon": loc["lon"], "members": []}
+        plan[key]["members"].append((slug, loc))
+    return list(plan.values())
+
+def region_requests():
+    """Regional requests needed for one region (one per parameter group)"""
+    from nasa_regional import REGIONAL_PARAMS_PER_REQUEST
+    return math.ceil(len(FEATURES) / max(1, REGIONAL_PARAMS_PER_REQUEST))
+
+def plan_regions(cells, span=None, min_cells=None):
+    """Group planned grid cells into bulk regions
+    
+    Cells are swept west to east; each unassigned cell seeds a window of
+    span degrees of longitude and +/- span/2 of latitude. The window becomes
+    a region only when it holds at least min_cells cells (default: more
+    cells than the regional requests one region costs), otherwise the seed
+    stays a point fetch. Returns (regions, point_cells).
+    """
+    span = NASA_REGION_SPAN_DEGREES if span is None else span
+    if min_cells is None:
+        min_cells = NASA_REGION_MIN_CELLS or region_requests() + 1
+    
+    remaining = sorted(cells, key=lambda c: (c["lon"], c["lat"]))
+    regions, point_cells = [], []
+    while remaining:
+        seed = remaining[0]
+        members = [
+            c for c in remaining
+            if c["lon"] - seed["lon"] <= span and abs(c["lat"] - seed["lat"]) <= span / 2
+        ]
+        if len(members) < min_cells:
+            point_cells.append(seed)
+            remaining = remaining[1:]
+            continue
         
-        return None, None
+        # Margin satu sel native agar sampling nearest tetap di dalam bbox
+        lat_pad, lon_pad = POWER_GRIDS[0][0], POWER_GRIDS[0][1]
+        regions.append({
+            "bbox": (
+                min(c["lon"] for c in members) - lon_pad,
+                min(c["lat"] for c in members) - lat_pad,
+                max(c["lon"] for c in members) + lon_pad,
+                max(c["lat"] for c in members) + lat_pad
+            ),
+            "cells": members,
+            "start": min(c["start"] for c in members)
+        })
+        taken = {id(c) for c in members}
+        remaining = [c for c in remaining if id(c) not in taken]
+    return regions, point_cells
+
+def fetch_region_rows(region):
+    """Fetch a region in bulk and sample every member cell from its grid
+    
+    Returns one {date: {feature: value}} per region["cells"], shaped like
+    request_power() output (missing values are -999). Rows are also stored
+    in the NASA cache under each cell's coordinates.
+    """
+    import numpy as np
+    from nasa_regional import fetch_regional, sample_points
+    
+    cells = region["cells"]
+    # Job ini sudah berjalan di pool fetch_all; request regional-nya berurutan
+    # agar total request bersamaan tetap <= NASA_MAX_WORKERS
+    native = fetch_regional(region["bbox"], region["start"], datetime.utcnow(), FEATURES, max_workers=1)
+    lats = np.array([c["lat"] for c in cells], dtype=float)
+    lons = np.array([c["lon"] for c in cells], dtype=float)
+    
+    rows = [{} for _ in cells]
+    for d in sorted({d for f in FEATURES for d in native[f][2]}):
+        columns = [sample_points(native[f], lats, lons, d) for f in FEATURES]
+        for i, row in enumerate(rows):
+            row[d] = {
+                f: float(column[i]) if np.isfinite(column[i]) else -999
+                for f, column in zip(FEATURES, columns)
+            }
+    
+    if NASA_CACHE:
+        for cell, row in zip(cells, rows):
+            NASA_CACHE.put_many(cell["lat"], cell["lon"], FEATURES, row)
+    return rows
+
+def fetch_cells(cells):
+    """Point fetch per cell; one rows dict (or None) per cell"""
+    return [fetch_rows(c["lat"], c["lon"], c["start"]) for c in cells]
+
+def fetch_region(region):
+    """Bulk fetch with per-cell point requests as the fallback"""
+    try:
+        return fetch_region_rows(region)
+    except Exception as e:
+        logger.error(f"❌ Regional fetch {region['bbox']} failed ({e}), falling back to point requests")
+        return fetch_cells(region["cells"])
+
+def plan_jobs(cells, mode=None):
+    """Turn planned cells into fetch jobs: [(callable, cells)]
+    
+    In regional mode, cells whose window is fully cached stay point jobs
+    (they cost no request); the rest are grouped by plan_regions().
+    """
+    mode = mode or NASA_FETCH_MODE
+    if mode != "regional":
+        return [(partial(fetch_cells, [cell]), [cell]) for cell in cells]
     
-    return date, data
+    pending = []
+    cached = []
+    for cell in cells:
+        dates = window_dates(cell["start"])
+        hits = NASA_CACHE.get_many(cell["lat"], cell["lon"], FEATURES, dates) if NASA_CACHE else {}
+        (cached if dates and len(hits) == len(dates) else pending).append(cell)
+    
+    regions, point_cells = plan_regions(pending)
+    logger.info(
+        f"🛰️ Regional mode: {len(regions)} regions ({sum(len(r['cells']) for r in regions)} cells), "
+        f"{len(point_cells)} point cells, {len(cached)} cached cells"
+    )
+    return (
+        [(partial(fetch_region, region), region["cells"]) for region in regions] +
+        [(partial(fetch_cells, [cell]), [cell]) for cell in point_cells + cached]
+    )
 
 def interpret(prob):
     """Interpret probability to human readable format"""
@@ -190,8 +446,349 @@ def interpret(prob):
     else:
         return {"status": "Berpotensi Banjir", "warna": "red", "level": "high"}
 
-def main():
-    """Main update function"""
+def feature_vector(data):
+    """Convert a NASA feature dict into a list of floats ordered like FEATURES"""
+    vector = [float(data[f]) for f in FEATURES]
+    if not all(math.isfinite(v) for v in vector):
+        raise ValueError("non-finite feature value")
+    return vector
+
+def predict_matrix(matrix):
+    """Run one scaler.transform + predict_proba over an (n, len(FEATURES)) matrix"""
+    import pandas as pd
+    
+    scaler, model = load_model()
+    # Scaler di-fit dengan nama kolom, jadi bungkus sekali per batch
+    frame = pd.DataFrame(matrix, columns=FEATURES)
+    return model.predict_proba(scaler.transform(frame))[:, 1]
+
+def score_batch(rows):
+    """Score many feature dicts with a single model call
+    
+    Returns a list of (prob, error) aligned with rows. A row that cannot be
+    turned into a feature vector only fails itself; if the batched call raises,
+    rows are re-scored one by one so a single bad row cannot sink the batch.
+    """
+    import numpy as np
+    
+    results = [(None, None)] * len(rows)
+    vectors = []
+    positions = []
+    
+    for i, data in enumerate(rows):
+        try:
+            vectors.append(feature_vector(data))
+            positions.append(i)
+        except Exception as e:
+            results[i] = (None, e)
+    
+    if not vectors:
+        return results
+    
+    matrix = np.asarray(vectors, dtype=float)
+    try:
+        probs = predict_matrix(matrix)
+        for i, prob in zip(positions, probs):
+            results[i] = (float(prob), None)
+    except Exception as e:
+        logger.warning(f"⚠️ Batch scoring failed ({e}), scoring rows individually")
+        for row, i in enumerate(positions):
+            try:
+                results[i] = (float(predict_matrix(matrix[row:row + 1])[0]), None)
+            except Exception as row_error:
+                results[i] = (None, row_error)
+    
+    return results
+
+def daily_entry(date, prob):
+    """One point of the short daily risk series stored with a prediction"""
+    interpretasi = interpret(prob)
+    return {
+        "date": date,
+        "probabilitas": prob,
+        "percentage": round(prob * 100, 1),
+        "status": interpretasi["status"],
+        "level": interpretasi["level"]
+    }
+
+def build_result(slug, loc, date, data, prob, daily=None):
+    """Build the prediction JSON document for one location"""
+    # Calculate percentage
+    percentage = round(prob * 100, 1)
+    
+    # Create result
+    result = {
+        "slug": slug,
+        "location": loc["name"],
+        "group": loc["group"],
+        "parent": loc["parent"],
+        "date": date,
+        "nasa": data,
+        "prediction": {
+            "probabilitas": prob,
+            "percentage": percentage
+        },
+        "interpretasi": interpret(prob),
+        "updated_at": datetime.utcnow().isoformat() + "Z",
+        "coordinates": {
+            "lat": loc["lat"],
+            "lon": loc["lon"]
+        },
+        "metadata": {
+            "model_version": "v1.0",
+            "features_used": FEATURES,
+            "data_source": "NASA POWER"
+        }
+    }
+    
+    if daily is not None:
+        result["daily"] = daily
+    
+    # Calculate data age
+    try:
+        data_date = datetime.strptime(date, "%Y%m%d")
+        data_age = datetime.utcnow() - data_date
+        result["data_age_days"] = data_age.days
+        result["metadata"]["data_age_days"] = data_age.days
+    except:
+        pass
+    
+    return result
+
+def load_published():
+    """Predictions of the current generation, or the per-slug files if none exists"""
+    try:
+        generation, predictions = snapshots.load()
+        if generation:
+            return predictions
+    except Exception as e:
+        logger.error(f"Error loading current snapshot: {e}")
+    
+    predictions = {}
+    for name in os.listdir(OUT_DIR):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(OUT_DIR, name), "r", encoding="utf-8") as f:
+                predictions[name[:-len(".json")]] = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading {name}: {e}")
+    return predictions
+
+def publish_results(results):
+    """Publish a new generation: previous predictions overlaid with this run's results
+    
+    Locations not updated in this run keep their previous prediction. The
+    per-slug files in predictions/ are kept as a mirror (used by the GitHub
+    workflow) and are each replaced atomically.
+    """
+    predictions = load_published()
+    predictions.update(results)
+    
+    generation = snapshots.publish(predictions)
+    logger.info(f"📦 Published generation {generation} ({len(predictions)} locations)")
+    
+    for slug, result in results.items():
+        snapshots.write_atomic(
+            os.path.join(OUT_DIR, f"{slug}.json"),
+            json.dumps(result, indent=2, ensure_ascii=False)
+        )
+    
+    return generation
+
+def fetch_all(items, max_workers=1, deadline=None):
+    """Fetch NASA data for (slug, loc) pairs with up to max_workers requests in flight
+    
+    Locations are grouped by plan_fetches() so each POWER grid cell is
+    requested once and the parsed result is shared by every slug in it.
+    In regional mode, nearby cells are further grouped into bulk regional
+    requests (plan_jobs).
+    Each cell only asks for the days after its members' last stored date.
+    Once the optional deadline (a time.time() value) passes, no further
+    cells are started; requests already running are waited for (their
+    results are dropped) so nothing is written after the generator ends.
+    Yields (slug, loc, date, data, window, error) in completion order, where
+    window holds every valid day of the fetch window. Pacing is done by
+    the shared RATE_LIMITER, so wall-clock time follows the rate limit rather
+    than the number of locations.
+    """
+    cells = plan_fetches(items)
+    total = sum(len(cell["members"]) for cell in cells)
+    logger.info(f"🗺️ Fetch plan: {len(cells)} grid cells for {total} locations ({NASA_FETCH_MODE} mode)")
+    
+    # Minta hanya tanggal setelah hari terakhir yang sudah tersimpan
+    default_start = datetime.utcnow() - timedelta(days=FETCH_WINDOW_DAYS)
+    last_dates = SERIES_STORE.last_dates() if SERIES_STORE else {}
+    for cell in cells:
+        cell["start"] = min(
+            SeriesStore.next_start(last_dates.get(slug), default_start)
+            for slug, _ in cell["members"]
+        )
+    
+    def fan_out(cell, rows, error):
+        for slug, loc in cell["members"]:
+            if error:
+                yield slug, loc, None, None, None, error
+                continue
+            try:
+                if SERIES_STORE:
+                    if rows:
+                        SERIES_STORE.ingest(slug, rows)
+                    elif rows is None:
+                        logger.warning(f"⚠️ NASA request failed for {loc['name']}, using stored series")
+                    series = SERIES_STORE.rows(slug)
+                else:
+                    series = rows or {}
+                
+                date, data = latest_valid(series)
+                window = valid_window(series)
+                
+                if not data:
+                    date, data = load_existing(loc["name"], slug)
+                    window = {date: data} if data else {}
+                yield slug, loc, date, data, window, None
+            except Exception as e:
+                yield slug, loc, None, None, None, e
+    
+    def fan_out_job(job_cells, rows_list, error):
+        for i, cell in enumerate(job_cells):
+            yield from fan_out(cell, None if error else rows_list[i], error)
+    
+    def expired():
+        return deadline is not None and time.time() >= deadline
+    
+    jobs = plan_jobs(cells)
+    
+    if max_workers <= 1:
+        for job, job_cells in jobs:
+            if expired():
+                return
+            try:
+                rows_list = job()
+                yield from fan_out_job(job_cells, rows_list, None)
+            except Exception as e:
+                yield from fan_out_job(job_cells, None, e)
+        return
+    
+    # Job diserahkan satu per slot kosong, dan hanya sebelum deadline, sehingga
+    # tidak ada antrean job yang masih menulis cache/series setelah run selesai
+    pending = iter(jobs)
+    running = {}
+    
+    def submit_next():
+        if expired():
+            return False
+        job = next(pending, None)
+        if job is None:
+            return False
+        running[pool.submit(job[0])] = job[1]
+        return True
+    
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nasa")
+    try:
+        while len(running) < max_workers and submit_next():
+            pass
+        while running:
+            timeout = None if deadline is None else max(0, deadline - time.time())
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                job_cells = running.pop(future)
+                try:
+                    yield from fan_out_job(job_cells, future.result(), None)
+                except Exception as e:
+                    yield from fan_out_job(job_cells, None, e)
+                submit_next()
+        if running:
+            logger.warning(f"⏰ Fetch deadline reached, waiting for {len(running)} running requests")
+    finally:
+        # Tunggu job yang sedang berjalan (dibatasi timeout request) sebelum kembali
+        pool.shutdown(wait=True)
+
+def parse_timestamp(text):
+    try:
+        return datetime.fromisoformat(str(text).replace("Z", ""))
+    except ValueError:
+        return None
+
+def plan_selective(index, previous, now=None):
+    """Decide which locations can have newer NASA data
+    
+    Uses each published result's date (equivalently data_age_days):
+    - no previous result, or one older than UPDATE_MAX_AGE_HOURS: forced
+    - date already at yesterday (the newest NASA can publish): carried over
+    - otherwise a candidate; the first UPDATE_PROBE_LOCATIONS are probes
+    Candidates are ordered Laravel-critical first, then stalest first.
+    Returns {"probe": [...], "rest": [...], "forced": {...}, "fresh": n}.
+    """
+    now = now or datetime.utcnow()
+    newest_possible = (now - timedelta(days=1)).strftime("%Y%m%d")
+    max_age = timedelta(hours=UPDATE_MAX_AGE_HOURS)
+    
+    candidates, forced, fresh = [], set(), 0
+    for slug, loc in index.items():
+        prev = previous.get(slug) or {}
+        updated_at = parse_timestamp(prev.get("updated_at"))
+        if not prev.get("date") or updated_at is None or now - updated_at > max_age:
+            forced.add(slug)
+        elif prev["date"] >= newest_possible:
+            fresh += 1
+            continue
+        candidates.append((slug, loc))
+    
+    laravel = set(LARAVEL_LOCATIONS)
+    candidates.sort(key=lambda item: (
+        item[0] not in laravel,
+        (previous.get(item[0]) or {}).get("date") or ""
+    ))
+    
+    probe = [item for item in candidates if item[0] not in forced][:UPDATE_PROBE_LOCATIONS]
+    probe_slugs = {slug for slug, _ in probe}
+    rest = [item for item in candidates if item[0] not in probe_slugs]
+    return {"probe": probe, "rest": rest, "forced": forced, "fresh": fresh}
+
+def selective_fetch(plan, previous, max_workers, deadline, stats):
+    """fetch_all over the plan: probes first, the rest only if NASA advanced
+    
+    If no probe location got a date newer than its published one, only
+    the forced locations are fetched and the other candidates keep their
+    previous prediction. stats receives probe_advanced and dropped.
+    """
+    advanced = not plan["probe"]
+    for item in fetch_all(plan["probe"], max_workers, deadline):
+        slug, _, date, data, _, error = item
+        if data and not error and date > ((previous.get(slug) or {}).get("date") or ""):
+            advanced = True
+        yield item
+    
+    rest = plan["rest"]
+    if not advanced:
+        rest = [item for item in rest if item[0] in plan["forced"]]
+        logger.info(f"💤 No newer NASA data for probe locations, carrying over {len(plan['rest']) - len(rest)} locations")
+    stats["probe_advanced"] = advanced
+    stats["dropped"] = len(plan["rest"]) - len(rest)
+    set_progress(total=len(plan["probe"]) + len(rest))
+    yield from fetch_all(rest, max_workers, deadline)
+
+def main(max_workers=None, deadline=None, mode=None):
+    """Main update function
+    
+    deadline is an optional time.time() value; once it passes, no further
+    locations are fetched and the run finishes with what it has.
+    mode is "selective" or "full" (default UPDATE_MODE).
+    """
+    if not RUN_LOCK.acquire(blocking=False):
+        raise RuntimeError("Update already running")
+    try:
+        return run_update(max_workers, deadline, mode or UPDATE_MODE)
+    except Exception:
+        set_progress(state="failed", current_slug=None)
+        raise
+    finally:
+        RUN_LOCK.release()
+
+def run_update(max_workers=None, deadline=None, mode="full"):
     logger.info("=" * 60)
     logger.info("🚀 STARTING PREDICTION UPDATE")
     logger.info(f"📊 Total locations: {len(LOCATION_INDEX)}")
@@ -199,127 +796,239 @@ def main():
     logger.info(f"⏰ Current time: {datetime.utcnow().isoformat()}Z")
     logger.info("=" * 60)
     
+    load_model()
+    
     updated_count = 0
     failed_count = 0
     skipped_count = 0
+    timed_out = False
     start_time = time.time()
+    nasa_before = nasa_stats()
+    phases = {}
+    phase_started = time.perf_counter()
+    
+    # Rencana: semua lokasi (full) atau hanya yang datanya bisa bertambah
+    selection = {"probe_advanced": None, "dropped": 0}
+    if mode == "selective":
+        previous = load_published()
+        plan = plan_selective(LOCATION_INDEX, previous)
+        to_process = plan["probe"] + plan["rest"]
+        carried_over = len(LOCATION_INDEX) - len(to_process)
+        logger.info(
+            f"🧭 Selective update: {len(to_process)} to process "
+            f"({len(plan['forced'])} forced, {len(plan['probe'])} probes), {plan['fresh']} already fresh"
+        )
+    else:
+        to_process = list(LOCATION_INDEX.items())
+        carried_over = 0
+    
+    total_locations = len(to_process)
+    
+    set_progress(
+        state="fetching",
+        started_at=datetime.utcnow().isoformat() + "Z",
+        total=total_locations,
+        processed=0,
+        failed=0,
+        skipped=0,
+        updated=0,
+        current_slug=None,
+        eta_seconds=None,
+        elapsed_seconds=0.0
+    )
+    
+    workers = max_workers or NASA_MAX_WORKERS
+    logger.info(f"🧵 Fetch workers: {workers}, rate limit: {NASA_RATE_PER_SECOND}/s")
+    
+    # Anggaran retry dan deadline berlaku untuk seluruh run
+    RETRY_BUDGET.reset(NASA_RETRY_BUDGET, deadline)
+    CIRCUIT.reset()
+    
+    if mode == "selective":
+        fetched = selective_fetch(plan, previous, workers, deadline, selection)
+    else:
+        fetched = fetch_all(to_process, workers, deadline)
     
-    total_locations = len(LOCATION_INDEX)
+    # === PHASE 1: GATHER ===
+    gathered = []
+    processed = 0
+    for idx, (slug, loc, date, data, window, error) in enumerate(fetched, 1):
+        processed = idx
+        expected = total_locations - selection["dropped"]
+        logger.info(f"📍 [{idx}/{expected}] {loc['name']} ({slug})...")
+        
+        if error:
+            failed_count += 1
+            logger.error(f"❌ Failed {slug}: {error}")
+        elif not data:
+            logger.warning(f"⏭️ Skipping {slug}: no data")
+            skipped_count += 1
+        else:
+            gathered.append((slug, loc, date, data, window))
+        
+        elapsed = time.time() - start_time
+        set_progress(
+            processed=idx,
+            failed=failed_count,
+            skipped=skipped_count,
+            current_slug=slug,
+            elapsed_seconds=round(elapsed, 1),
+            eta_seconds=round(elapsed / idx * (expected - idx), 1)
+        )
+    
+    if mode == "selective":
+        # Lokasi (tidak wajib) yang tanggalnya tidak bertambah tidak di-score ulang
+        unchanged = [
+            item for item in gathered
+            if item[0] not in plan["forced"] and item[2] <= ((previous.get(item[0]) or {}).get("date") or "")
+        ]
+        if unchanged:
+            skip = {item[0] for item in unchanged}
+            gathered = [item for item in gathered if item[0] not in skip]
+            carried_over += len(unchanged)
+    
+    carried_over += selection["dropped"]
+    expected = total_locations - selection["dropped"]
+    if processed < expected:
+        timed_out = True
+        skipped_count += expected - processed
+        logger.warning(f"⏰ Deadline reached, {expected - processed} locations not fetched")
+    
+    phases["fetch"] = time.perf_counter() - phase_started
+    
+    # === PHASE 2: SCORE (semua hari valid semua lokasi dalam satu panggilan) ===
+    phase_started = time.perf_counter()
+    set_progress(state="scoring", current_slug=None, eta_seconds=None)
+    days = []
+    for i, (slug, loc, date, data, window) in enumerate(gathered):
+        window = dict(window or {})
+        window[date] = data
+        for d in sorted(window)[-DAILY_SERIES_DAYS:]:
+            days.append((i, d, window[d]))
     
-    for idx, (slug, loc) in enumerate(LOCATION_INDEX.items(), 1):
+    scored_days = [{} for _ in gathered]
+    for (i, d, vals), scored in zip(days, score_batch([vals for _, _, vals in days])):
+        scored_days[i][d] = (vals, scored)
+    
+    phases["score"] = time.perf_counter() - phase_started
+    
+    # === PHASE 3: WRITE ===
+    phase_started = time.perf_counter()
+    set_progress(state="writing")
+    results = {}
+    history_rows = []
+    for (slug, loc, date, data, _), per_day in zip(gathered, scored_days):
+        prob, error = per_day[date][1]
+        if error:
+            logger.error(f"❌ Prediction error {slug}: {error}")
+            failed_count += 1
+            continue
+        
         try:
-            logger.info(f"📍 [{idx}/{total_locations}] {loc['name']} ({slug})...")
-            
-            # Fetch data
-            date, data = fetch_valid_with_fallback(
-                loc["lat"], 
-                loc["lon"], 
-                loc["name"],
-                slug
+            daily = [
+                daily_entry(d, day_prob)
+                for d, (_, (day_prob, day_error)) in sorted(per_day.items())
+                if day_error is None
+            ]
+            result = build_result(slug, loc, date, data, prob, daily)
+            results[slug] = result
+            history_rows.extend(
+                build_result(slug, loc, d, vals, day_prob)
+                for d, (vals, (day_prob, day_error)) in per_day.items()
+                if day_error is None
             )
-            
-            if not data:
-                logger.warning(f"⏭️ Skipping {slug}: no data")
-                skipped_count += 1
-                continue
-            
-            # Prepare features and predict
-            df = pd.DataFrame([data], columns=FEATURES)
-            
-            try:
-                scaled_features = scaler.transform(df)
-                prob = float(model.predict_proba(scaled_features)[0][1])
-            except Exception as e:
-                logger.error(f"❌ Prediction error: {e}")
-                failed_count += 1
-                continue
-            
-            # Calculate percentage
-            percentage = round(prob * 100, 1)
-            
-            # Create result
-            result = {
-                "slug": slug,
-                "location": loc["name"],
-                "group": loc["group"],
-                "parent": loc["parent"],
-                "date": date,
-                "nasa": data,
-                "prediction": {
-                    "probabilitas": prob,
-                    "percentage": percentage
-                },
-                "interpretasi": interpret(prob),
-                "updated_at": datetime.utcnow().isoformat() + "Z",
-                "coordinates": {
-                    "lat": loc["lat"],
-                    "lon": loc["lon"]
-                },
-                "metadata": {
-                    "model_version": "v1.0",
-                    "features_used": FEATURES,
-                    "data_source": "NASA POWER"
-                }
-            }
-            
-            # Calculate data age
-            try:
-                data_date = datetime.strptime(date, "%Y%m%d")
-                data_age = datetime.utcnow() - data_date
-                result["data_age_days"] = data_age.days
-                result["metadata"]["data_age_days"] = data_age.days
-            except:
-                pass
-            
-            # Save to file
-            output_path = os.path.join(OUT_DIR, f"{slug}.json")
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(result, f, indent=2, ensure_ascii=False)
-            
-            updated_count += 1
-            logger.info(f"✅ Updated {slug}: {percentage}% ({interpret(prob)['status']})")
-            
-            # Rate limiting
-            if idx < total_locations and idx % 5 == 0:
-                sleep_time = 3.0
-                logger.debug(f"⏳ Sleeping {sleep_time}s...")
-                time.sleep(sleep_time)
-            
+            logger.info(f"✅ Updated {slug}: {result['prediction']['percentage']}% ({result['interpretasi']['status']})")
         except Exception as e:
             failed_count += 1
             logger.error(f"❌ Failed {slug}: {e}")
     
+    generation = None
+    if results:
+        generation = publish_results(results)
+        updated_count = len(results)
+        
+        try:
+            history.record(history_rows)
+        except Exception as e:
+            logger.error(f"❌ Failed to record history: {e}")
+    
+    phases["write"] = time.perf_counter() - phase_started
+    for phase, seconds in phases.items():
+        UPDATE_PHASE_SECONDS.observe(seconds, phase=phase)
+    
+    nasa_after = nasa_stats()
+    nasa = {k: nasa_after[k] - nasa_before[k] for k in nasa_after}
+    latency = nasa.pop("latency_seconds")
+    nasa["mean_latency_seconds"] = round(latency / nasa["requests"], 3) if nasa["requests"] else None
+    
     elapsed_time = time.time() - start_time
     
     logger.info("=" * 60)
     logger.info("🎯 UPDATE COMPLETED")
     logger.info(f"✅ Success: {updated_count}")
     logger.info(f"⚠️ Skipped: {skipped_count}")
+    logger.info(f"♻️ Carried over: {carried_over}")
     logger.info(f"❌ Failed:  {failed_count}")
     logger.info(f"⏱️ Elapsed: {elapsed_time:.1f} seconds")
+    logger.info(
+        "⏱️ Phases: " + ", ".join(f"{p} {s:.1f}s" for p, s in phases.items()) +
+        f" | NASA: {nasa['requests']} requests, {nasa['retries']} retries, {nasa['rate_limited']} rate-limited"
+    )
     logger.info("=" * 60)
     
     # Return summary
+    if updated_count > 0:
+        status = "success"
+    elif carried_over and not failed_count and not skipped_count:
+        status = "unchanged"
+    else:
+        status = "partial" if skipped_count > 0 else "failed"
+    
     summary = {
         "success": updated_count,
         "skipped": skipped_count,
         "failed": failed_count,
-        "total": total_locations,
+        "carried_over": carried_over,
+        "total": len(LOCATION_INDEX),
         "elapsed_seconds": round(elapsed_time, 1),
         "completed_at": datetime.utcnow().isoformat() + "Z",
-        "status": "success" if updated_count > 0 else "partial" if skipped_count > 0 else "failed"
+        "timed_out": timed_out,
+        "generation": generation or snapshots.current_generation(),
+        "status": status,
+        "mode": mode,
+        "probe_advanced": selection["probe_advanced"],
+        "fetch_mode": NASA_FETCH_MODE,
+        "phases": {p: round(s, 3) for p, s in phases.items()},
+        "nasa": nasa
     }
+    UPDATE_RUNS.inc(status=summary["status"])
     
     # Save summary
-    summary_path = os.path.join(BASE_DIR, "update_summary.json")
-    with open(summary_path, "w") as f:
+    with open(SUMMARY_FILE, "w") as f:
         json.dump(summary, f, indent=2)
     
+    set_progress(
+        state="done",
+        updated=updated_count,
+        failed=failed_count,
+        skipped=skipped_count,
+        current_slug=None,
+        eta_seconds=0,
+        elapsed_seconds=summary["elapsed_seconds"],
+        completed_at=summary["completed_at"]
+    )
+    
     return summary
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Update flood predictions from NASA POWER")
+    parser.add_argument("--full", action="store_true", help="Process every location (ignore staleness)")
+    parser.add_argument("--workers", type=int, help="NASA fetch workers")
+    args = parser.parse_args()
+    
     try:
-        result = main()
+        result = main(max_workers=args.workers, mode="full" if args.full else None)
         print(json.dumps(result, indent=2))
     except KeyboardInterrupt:
         logger.info("Update interrupted by user")